@@ -0,0 +1,97 @@
+"""
+Seeded generators of synthetic cities for the benchmarks
+
+Each generator returns the roads, tracks and friends of a connected city with about the requested amount of locations, and the same seed always gives the same city.
+"""
+
+import math
+import random
+from typing import List, Tuple
+
+from roads_and_tracks import CityMap
+
+City = Tuple[List[Tuple[int, int, int]], List[Tuple[int, int, int]], List[Tuple[str, int]]]
+
+
+def grid(locations: int, seed: int = 0, max_time: int = 10) -> City:
+    # A square grid of streets with random integer road times
+    rng = random.Random(seed)
+    side = max(2, math.isqrt(locations))
+    roads = []
+    for row in range(side):
+        for column in range(side):
+            location = row*side + column
+            if column+1 < side:
+                roads.append((location, location+1, rng.randint(1, max_time)))
+            if row+1 < side:
+                roads.append((location, location+side, rng.randint(1, max_time)))
+    return roads, _tracks(rng, side*side, roads), _friends(rng, side*side)
+
+
+def geometric(locations: int, seed: int = 0, degree: int = 6) -> City:
+    # Random points in the unit square joined to the points within a radius giving the requested average degree, with road times proportional to their length
+    rng = random.Random(seed)
+    points = [(rng.random(), rng.random()) for _ in range(locations)]
+    radius = math.sqrt(degree / (math.pi * locations))
+    cells = {}
+    for location, (x, y) in enumerate(points):
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(location)
+
+    def time(u: int, v: int) -> int:
+        return 1 + int(1000 * math.dist(points[u], points[v]))
+
+    # Join the points within the radius, looking only in the neighbouring cells
+    roads = []
+    for (cell_x, cell_y), members in cells.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for v in cells.get((cell_x + dx, cell_y + dy), ()):
+                    for u in members:
+                        if u < v and math.dist(points[u], points[v]) <= radius:
+                            roads.append((u, v, time(u, v)))
+
+    # Join consecutive points along the x axis so the city is connected
+    by_x = sorted(range(locations), key=lambda location: points[location])
+    roads.extend((u, v, time(u, v)) for u, v in zip(by_x, by_x[1:]))
+    return roads, _tracks(rng, locations, roads), _friends(rng, locations)
+
+
+def scale_free(locations: int, seed: int = 0, edges_per_location: int = 2, max_time: int = 10) -> City:
+    # Preferential attachment, each new location joins locations chosen in proportion to their amount of roads, giving a few hubs with many roads
+    rng = random.Random(seed)
+    ends = [0, 1]
+    roads = [(0, 1, rng.randint(1, max_time))]
+    for location in range(2, locations):
+        for v in {rng.choice(ends) for _ in range(edges_per_location)}:
+            roads.append((location, v, rng.randint(1, max_time)))
+            ends.extend((location, v))
+    return roads, _tracks(rng, locations, roads), _friends(rng, locations)
+
+
+GENERATORS = {'grid': grid, 'geometric': geometric, 'scale_free': scale_free}
+
+
+def city(generator: str, locations: int, seed: int = 0, **options) -> CityMap:
+    roads, tracks, friends = GENERATORS[generator](locations, seed)
+    return CityMap(roads, tracks, friends, **options)
+
+
+def _tracks(rng: random.Random, locations: int, roads: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    # Overlay short transit lines, each following a random walk along the roads from a random road
+    adjacency = {}
+    for u, v, _ in roads:
+        adjacency.setdefault(u, []).append(v)
+        adjacency.setdefault(v, []).append(u)
+    tracks = []
+    for _ in range(max(1, locations // 50)):
+        u = rng.choice(roads)[0]
+        for _ in range(rng.randint(2, 6)):
+            v = rng.choice(adjacency[u])
+            tracks.append((u, v, rng.randint(1, 10)))
+            u = v
+    return tracks
+
+
+def _friends(rng: random.Random, locations: int) -> List[Tuple[str, int]]:
+    # Place one friend per hundred locations at random homes
+    return [(f'friend{i}', rng.randrange(locations)) for i in range(max(1, locations // 100))]
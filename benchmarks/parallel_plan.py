@@ -0,0 +1,46 @@
+"""
+Benchmark of ParallelPlanner throughput against a single process plan_many on a grid city
+
+Usage: python -m benchmarks.parallel_plan [--side 100] [--queries 100000] [--processes 1 2 4 8]
+"""
+
+import argparse
+import os
+import random
+import time
+
+from benchmarks.generators import city
+from roads_and_tracks import ParallelPlanner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--side', type=int, default=100, help='locations per side of the grid')
+    parser.add_argument('--queries', type=int, default=100000)
+    parser.add_argument('--endpoints', type=int, default=2000, help='distinct endpoints the queries are drawn from')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, os.cpu_count()])
+    parser.add_argument('--cache-size', type=int, default=256, help='shortest path trees cached by each worker')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    city_map = city('grid', args.side*args.side, args.seed, compact=True)
+    rng = random.Random(args.seed)
+    endpoints = [rng.randrange(city_map.locations+1) for _ in range(args.endpoints)]
+    queries = [(rng.choice(endpoints), rng.choice(endpoints)) for _ in range(args.queries)]
+
+    began = time.perf_counter()
+    expected = city_map.plan_many(queries)
+    serial = time.perf_counter() - began
+    print(f'serial plan_many: {len(queries)/serial:,.0f} queries/s')
+
+    for processes in sorted(set(args.processes)):
+        with ParallelPlanner(city_map, processes, cache_size=args.cache_size) as planner:
+            began = time.perf_counter()
+            plans = planner.plan_many(queries)
+            elapsed = time.perf_counter() - began
+        assert plans == expected
+        print(f'{processes} processes: {len(queries)/elapsed:,.0f} queries/s, {serial/elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Benchmark of the dijkstra priority queues, MinHeap, IndexedMinHeap and BucketQueue, on a grid city
+
+Usage: python -m benchmarks.queues [--side 100] [--searches 20]
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.generators import city
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--side', type=int, default=100, help='locations per side of the grid')
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    city_map = city('grid', args.side*args.side, args.seed, compact=True)
+    rng = random.Random(args.seed)
+    sources = [rng.randrange(city_map.locations+1) for _ in range(args.searches)]
+    print(f'{city_map.locations+1} locations, largest road time {city_map.max_road_time}, automatic queue {city_map.queue!r}')
+
+    baseline = None
+    for queue in ('heap', 'indexed', 'bucket'):
+        began = time.perf_counter()
+        for source in sources:
+            city_map.dijkstra(source, queue=queue)
+        elapsed = (time.perf_counter() - began) / len(sources)
+        baseline = baseline or elapsed
+        print(f'{queue:>8}: {elapsed*1000:.1f} ms per search, {baseline/elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark suite measuring how CityMap construction, dijkstra, reconstruct_path and plan scale on synthetic cities
+
+Usage: python -m benchmarks.suite [--generators grid geometric scale_free] [--sizes 1000 10000 100000 1000000] [--queries 100] [--output results.json]
+
+The results are written as JSON, one entry per generator and size, so runs can be compared over time.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import List
+
+from benchmarks.generators import GENERATORS
+from roads_and_tracks import CityMap
+
+
+def percentiles(samples: List[float]) -> dict:
+    # The median and 99th percentile of the samples in milliseconds
+    ordered = sorted(samples)
+    return {'p50_ms': 1000 * ordered[len(ordered) // 2], 'p99_ms': 1000 * ordered[min(len(ordered)-1, int(len(ordered) * 0.99))]}
+
+
+def timed(function, *args) -> float:
+    began = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - began
+
+
+def run(generator: str, size: int, queries: int, seed: int, compact: bool, memory: bool) -> dict:
+    roads, tracks, friends = GENERATORS[generator](size, seed)
+    result = {'generator': generator, 'requested_locations': size, 'roads': len(roads), 'tracks': len(tracks), 'friends': len(friends), 'compact': compact}
+
+    # Time the construction, then build again under tracemalloc for its peak memory as tracing slows it down
+    gc.collect()
+    began = time.perf_counter()
+    city_map = CityMap(roads, tracks, friends, compact=compact)
+    result['construction_s'] = time.perf_counter() - began
+    result['locations'] = city_map.locations + 1
+    if memory:
+        del city_map
+        gc.collect()
+        tracemalloc.start()
+        city_map = CityMap(roads, tracks, friends, compact=compact)
+        result['construction_peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # Time each operation on the same random queries
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(city_map.locations+1), rng.randrange(city_map.locations+1)) for _ in range(queries)]
+    stops = [rng.randrange(city_map.locations+1) for _ in range(queries)]
+    result['dijkstra'] = percentiles([timed(city_map.dijkstra, start) for start, _ in pairs])
+    result['reconstruct_path'] = percentiles([timed(city_map.reconstruct_path, start, stop, destination) for (start, destination), stop in zip(pairs, stops)])
+    plan_times = [timed(city_map.plan, start, destination) for start, destination in pairs]
+    result['plan'] = percentiles(plan_times)
+    result['plan_throughput_qps'] = len(plan_times) / sum(plan_times)
+    return result
+
+
+def metadata(seed: int) -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': sys.version.split()[0], 'platform': platform.platform(), 'commit': commit, 'seed': seed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--generators', nargs='+', choices=sorted(GENERATORS), default=sorted(GENERATORS))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000], help='amounts of locations')
+    parser.add_argument('--queries', type=int, default=100, help='queries timed per operation')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compact', action='store_true', help='build compact cities')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip measuring peak construction memory')
+    parser.add_argument('--output', help='file to write the JSON results to, standard output if not given')
+    args = parser.parse_args()
+
+    results = []
+    for generator in args.generators:
+        for size in args.sizes:
+            result = run(generator, size, args.queries, args.seed, args.compact, args.memory)
+            results.append(result)
+            print(f"{generator:>10} {result['locations']:>8} locations: construction {result['construction_s']:.2f} s, plan p50 {result['plan']['p50_ms']:.1f} ms p99 {result['plan']['p99_ms']:.1f} ms", file=sys.stderr)
+
+    report = json.dumps({'metadata': metadata(args.seed), 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
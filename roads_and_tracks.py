@@ -1,26 +1,68 @@
-from typing import List, Tuple
+import asyncio
+import contextlib
+import csv
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import struct
+import threading
+from array import array
+from collections import OrderedDict, deque
+from operator import itemgetter
+from mmap import ACCESS_COPY, mmap as memory_map
+from multiprocessing import shared_memory
+from time import perf_counter
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The largest integer road time for which the dijkstra function uses a bucket queue by default
+BUCKET_QUEUE_LIMIT = 1024
+
+# The magic string and version at the start of files written by CityMap.save
+FORMAT_MAGIC = b'CITYMAP\x00'
+FORMAT_VERSION = 1
+
+# The amount of queries whose pickups plan_many scans in one matrix operation when vectorized
+VECTORIZED_BLOCK_SIZE = 256
+
 
 class CityMap:
-    def __init__(self, roads: List[Tuple[int, int, int]], tracks: List[Tuple[int, int, int]], friends: List[Tuple[str, int]]):
+    # The callable given the PlanStats of sampled plans, and the fraction of plans it is given, see set_stats_hook
+    stats_hook = None
+    stats_sample_rate = 1.0
+
+    def __init__(self, roads: Iterable[Tuple[int, int, int]], tracks: Iterable[Tuple[int, int, int]], friends: Iterable[Tuple[str, int]], compact: bool = False, cache_size: int = 0, landmarks: int = 0, queue: Optional[str] = None, max_tracks: int = 2, vectorized: bool = False, pickup_index: bool = False):
         """
         Function Description: This initialisation sets up the road graph and locations friends can be picked up from
 
-        Approach Description: The graph is an adjacency list, where the index of the list represents the location and the value is another list containing a list of roads and a tuple with the frind that can be picked up from that location and the amount of tracks used to get there. The graph is then populated with the roads and friends. When each new track is added, it checks if the start of the track contains a friend and if the friend at the destination of the track has a higher distance than one more than the distance of the friend from the start of the tracks location it adds it to the track destinations tuple with a distance incremented by 1.
+        Approach Description: The graph is an adjacency list, where the index of the list represents the location and the value is a list of roads, grown as new locations appear while the roads are read once, alongside a pickup list where the index represents the location and the value is a tuple of every frind that can be picked up from that location with the amount of tracks used to get there, ordered by the amount of tracks. If compact is set, the roads are instead read once into arrays of their ends and times and then counted into compressed sparse row arrays, and the pickups in compressed sparse row arrays of friend ids and track depths, which use a few machine words per road rather than several Python objects. The graph is then populated with the roads and friends, and the pickups are found with a breadth first search along the tracks from every friend's home at once, up to max_tracks tracks.
 
         Input:
-            roads: a list of tuples containing integers representing the roads
-            tracks: a list of tuples containing integers representing the tracks
-            friends: a list of tuples containing strings representing the friends and the locations they live at
+            roads: an iterable of tuples containing integers representing the roads, which is only iterated once
+            tracks: an iterable of tuples containing integers representing the tracks
+            friends: an iterable of tuples containing strings representing the friends and the locations they live at
+            compact: a boolean representing whether the graph should be stored in compact arrays rather than Python lists
+            cache_size: an integer representing the amount of shortest path trees kept in the least recently used search cache shared by plan and plan_many
+            landmarks: an integer representing the amount of landmarks to precompute distances from for goal directed point to point queries, which can also be built later with build_landmarks
+            queue: an optional string, 'heap', 'indexed' or 'bucket', representing the priority queue used by the dijkstra function, chosen from the road times if not given
+            max_tracks: an integer representing the largest amount of tracks a friend can take to a pickup location
+            vectorized: a boolean representing whether plan and plan_many should scan the pickups with NumPy, which must be installed
+            pickup_index: a boolean representing whether to build the index of the nearest pickup to every location, which can also be built later with build_pickup_index
 
         Output: None
 
         Time Complexity: O(|R| + |T|), Θ(|R| + |T|), where |R| is the number of roads and |T| is the number of tracks
 
         Time Complexity Analysis: Given |R| is the number of roads and |T| is the number of tracks
-            Finding the maximum location costs O(|R|) as it iterates through all the roads to find the maximum location
-            The initialisation of the graph costs O(|L|) as it creates a list of size |L| where |L| is the maximum location
-            Populating the graph with roads costs O(|R|) as it iterates through all the roads
-            Finding the potential friends to pick up at each location costs O(3*|T|), O(|T|) as it iterates through all the tracks 3 times
+            Populating the graph with roads costs O(|R|) as it iterates through all the roads once, growing the graph to the maximum location as it goes
+            The growth of the graph costs O(|L|) in total where |L| is the maximum location
+            Finding the potential friends to pick up at each location costs O(|L| + |F| + |T|·k) as described in _propagate_pickups, where k is the largest amount of friends reaching one location
             It is stated that "It is possible to get from any location to any other location by driving along some number of roads", meaning the graph is connected, meaning that |R| + 1 >= |L|
             Populating the graph with friends costs O(|F|) as it iterates through all the friends, however it is defined that |F| <= |L|, and due to it being a connected graph |F| <= |R|+1 which therefore makes O(F) <= O(R) therefore making the time complexity O(|R| + |T|)
             
@@ -38,180 +80,705 @@ class CityMap:
         Space Complexity: O(|R| + |T|), Θ(|R|), where |R| is the amount of roads and |T| is the amount of tracks
 
         Space Complexity Analysis: Given |R| is the number of roads, |F| is the amount of friends and |T| is the amount of tracks
-            The road input requires O(|R|) space as it creates a list of size |R|
+            The road input requires O(|R|) space if it is a list of size |R|, or O(1) if it is a generator
             The track input requires O(|T|) space as it creates a list of size |T|
             The friends input requires O(|F|) space as it creates a list of size |F|
             The space complexity is these plus the auxiliary space complexity of the function which is O(|R|) making the space complexity O(|R| + |T| + |F|), however as defined above |F| <= |R| making the space complexity O(|R| + |T|)
 
             The big Θ notation is the same as the big O notation as the space complexity is the same in the best and worst case scenarios
         """
-        # Find the amount of locations
-        self.locations = max(max(roads, key=lambda x: x[0])[0], max(roads, key=lambda x: x[1])[1])
+        if vectorized and np is None:
+            raise ImportError('Vectorized planning requires NumPy')
+
+        self.compact = compact
+        self.vectorized = vectorized
+        self.search_cache = SearchCache(cache_size)
+        self.workspaces = threading.local()
+        self.hierarchy = None
+        self.landmarks = None
+        self.pickup_index = None
+
+        # Populate the graph with roads, either growing an adjacency list or collecting the ends and times of each road for the compact arrays
+        self.locations = -1
+        if compact:
+            sources, targets, weights = array('q'), array('q'), array('q')
+            for u, v, m in roads:
+                u, v = int(u), int(v)
+                self.locations = max(self.locations, u, v)
+                if weights.typecode == 'q' and not isinstance(m, int):
+                    weights = array('d', weights)
+                sources.append(u)
+                targets.append(v)
+                weights.append(m)
+        else:
+            self.roads = []
+            for u, v, m in roads:
+                u, v = int(u), int(v)
+                if max(u, v) > self.locations:
+                    self.locations = max(u, v)
+                    self.roads.extend([] for _ in range(self.locations+1-len(self.roads)))
+                self.roads[u].append((v, m))
+                self.roads[v].append((u, m))
+
+        # Find the amount of locations, including any only reached by tracks or friends
+        tracks = list(tracks)
+        friends = list(friends)
+        self.locations = max(self.locations, max((max(u, v) for u, v, _ in tracks), default=0), max((location for _, location in friends), default=0))
+        if compact:
+            self.roads = CSRGraph.from_edges(self.locations+1, sources, targets, weights)
+            del sources, targets, weights
+        else:
+            self.roads.extend([] for _ in range(self.locations+1-len(self.roads)))
+
+        # Populate the graph with friends and the locations they can be picked up from
+        self.tracks = tracks
+        self.friends = friends
+        self.max_tracks = max_tracks
+        self._propagate_pickups()
+
+        # Choose the priority queue and precompute the landmark distances if requested
+        automatic_queue = self._choose_queue()
+        self.queue = queue or automatic_queue
+        if landmarks:
+            self.build_landmarks(landmarks)
+        if pickup_index:
+            self.build_pickup_index()
+
+    def __getstate__(self) -> dict:
+        # The search workspaces belong to the threads of this process, so they are left out and made again as needed after unpickling or copying
+        state = self.__dict__.copy()
+        del state['workspaces']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.workspaces = threading.local()
+
+    @classmethod
+    def from_iterables(cls, roads: Iterable[Tuple[int, int, int]], tracks: Iterable[Tuple[int, int, int]] = (), friends: Iterable[Tuple[str, int]] = (), **options) -> 'CityMap':
+        """
+        Function Description: This function builds a CityMap from iterables of roads, tracks and friends, such as generators reading them from a file
+
+        Approach Description: The roads are consumed in a single pass and never held as a list, the graph growing as new locations appear, so the memory used while loading stays close to the size of the finished graph. The tracks and friends are kept as lists, as moving friends and adding tracks propagate the pickups from them again. The options are the keyword arguments of CityMap.
+
+        Time Complexity: O(|R| + |T| + |F| + |L|), where |R| is the number of roads, |T| is the number of tracks, |F| is the number of friends and |L| is the number of locations
+        """
+        return cls(roads, tracks, friends, **options)
+
+    @classmethod
+    def from_csv(cls, roads_path: str, tracks_path: Optional[str] = None, friends_path: Optional[str] = None, **options) -> 'CityMap':
+        """
+        Function Description: This function builds a CityMap from CSV files of roads (u, v, time), tracks (u, v, time) and friends (name, location), any of which may start with a header row
+
+        Approach Description: Each file is read lazily, row by row, by a generator passed to from_iterables, so no file is ever held in memory as a whole
+
+        Time Complexity: O(|R| + |T| + |F| + |L|), where |R| is the number of roads, |T| is the number of tracks, |F| is the number of friends and |L| is the number of locations
+        """
+        with contextlib.ExitStack() as stack:
+            def rows(path: Optional[str], types: tuple):
+                if path is None:
+                    return
+                # Blank lines, such as those at the end of a file, are skipped before looking for a header
+                for index, row in enumerate(row for row in csv.reader(stack.enter_context(open(path, newline=''))) if row):
+                    try:
+                        yield tuple(parse(value.strip()) for parse, value in zip(types, row))
+                    except ValueError:
+                        if index != 0:
+                            raise
+            return cls.from_iterables(rows(roads_path, (int, int, _number)), rows(tracks_path, (int, int, _number)), rows(friends_path, (str, int)), **options)
+
+    def _propagate_pickups(self) -> None:
+        """
+        Function Description: This function finds every friend that can be picked up at each location from the friends and tracks of the city
 
-        # Create the graph
-        self.graph = [[[],(None, None)] for _ in range(self.locations+1)]
+        Approach Description: The tracks leaving each location are first indexed in compressed sparse row arrays. A breadth first search is then run along the tracks from every friend's home at once, one layer per track up to max_tracks, where each layer only follows the tracks leaving locations that a friend newly reached in the previous layer. As the search is breadth first, the first time a friend reaches a location is with the fewest tracks, so each (friend, location) pair is found and expanded exactly once and the order of the tracks does not matter. The pickups at each location are ordered by their amount of tracks and then by the reverse order of the friends, so when friends share a home the one listed last is still picked up first.
 
-        # Populate the graph with roads
-        for u, v, m in roads:
-            self.graph[int(u)][0].append((v, m))
-            self.graph[int(v)][0].append((u, m))
+        Time Complexity: O(|L| + |F| + |T|·k), where |L| is the number of locations, |F| is the number of friends, |T| is the number of tracks and k is the largest amount of friends reaching one location
+
+        Time Complexity Analysis: Given |L| is the number of locations, |F| is the number of friends and |T| is the number of tracks
+            Indexing the tracks costs O(|L| + |T|) as it counts and then places each track
+            Each (friend, location) pair is expanded once along the tracks leaving its location, so each track is followed at most once per friend reaching its start, costing O(|F| + |T|·k)
+            Ordering and storing the pickups costs O(|L| + P·log(k)) where P <= |F| + |T|·k is the amount of pairs found
+
+        Auxiliary Space Complexity: O(|L| + |T| + P), where P is the amount of (friend, location) pairs found
+        """
+        # Index the tracks leaving each location
+        track_offsets = array('q', bytes(8*(self.locations+2)))
+        for u, _, _ in self.tracks:
+            track_offsets[u+1] += 1
+        for location in range(self.locations+1):
+            track_offsets[location+1] += track_offsets[location]
+        cursor = array('q', track_offsets)
+        track_targets = array('q', bytes(8*len(self.tracks)))
+        for u, v, _ in self.tracks:
+            track_targets[cursor[u]] = v
+            cursor[u] += 1
 
         # Populate the graph with friends at their home locations
-        for friend, location in friends:
-            self.graph[location][1] = (friend, 0)
+        reached = {}
+        frontier = {}
+        for friend_id, (_, location) in enumerate(self.friends):
+            reached.setdefault(location, {})[friend_id] = 0
+            frontier.setdefault(location, []).append(friend_id)
+
+        # Follow the tracks from the locations friends newly reached, one track at a time
+        for depth in range(1, self.max_tracks+1):
+            next_frontier = {}
+            for u, friend_ids in frontier.items():
+                for i in range(track_offsets[u], track_offsets[u+1]):
+                    v = track_targets[i]
+                    at_v = reached.setdefault(v, {})
+                    for friend_id in friend_ids:
+                        if friend_id not in at_v:
+                            at_v[friend_id] = depth
+                            next_frontier.setdefault(v, []).append(friend_id)
+            frontier = next_frontier
+
+        # Order the pickups at each location by their amount of tracks, then with the friends listed last first, as a friend listed later at the same home replaced an earlier one before pickups were kept for every friend
+        self.pickup_arrays = None
+        self.pickup_depths = None
+        pickups = {location: sorted(at.items(), key=lambda pickup: (pickup[1], -pickup[0])) for location, at in reached.items() if at}
+        if self.compact:
+            self.pickups = PickupTable.from_ids(self.locations+1, pickups, [friend for friend, _ in self.friends])
+        else:
+            self.pickups = [tuple((self.friends[friend_id][0], depth) for friend_id, depth in pickups.get(location, ())) for location in range(self.locations+1)]
+        if self.pickup_index is not None:
+            self.pickup_index.update(self._pickup_depths())
+
+    @classmethod
+    def from_arrays(cls, roads: 'CSRGraph', pickups: 'PickupTable', cache_size: int = 0, tracks: Optional[List[Tuple[int, int, int]]] = None, friends: Optional[List[Tuple[str, int]]] = None, max_tracks: int = 2, vectorized: bool = False, queue: Optional[str] = None, max_road_time: Optional[float] = None) -> 'CityMap':
+        """
+        Function Description: This function creates a compact CityMap directly from prebuilt road and pickup arrays, without building or propagating anything
+
+        Approach Description: The arrays are attached as they are, so a CityMap can be created over buffers that are shared between processes or mapped from a file without copying them. The tracks and friends the pickups were propagated from are only needed to move friends or add tracks later. If the queue and largest road time are given the roads are not scanned to choose the queue.
+
+        Time Complexity: O(1) if the queue and largest road time are given, otherwise O(|R|), where |R| is the number of roads
+        """
+        city_map = cls.__new__(cls)
+        city_map.locations = len(roads) - 1
+        city_map.compact = True
+        city_map.vectorized = vectorized
+        city_map.pickup_arrays = None
+        city_map.pickup_depths = None
+        city_map.search_cache = SearchCache(cache_size)
+        city_map.workspaces = threading.local()
+        city_map.roads = roads
+        city_map.pickups = pickups
+        city_map.tracks = tracks
+        city_map.friends = friends
+        city_map.max_tracks = max_tracks
+        city_map.hierarchy = None
+        city_map.landmarks = None
+        city_map.pickup_index = None
+        automatic_queue = city_map._choose_queue() if queue is None or max_road_time is None else None
+        if max_road_time is not None:
+            city_map.max_road_time = max_road_time
+        city_map.queue = queue or automatic_queue
+        return city_map
+
+    def compact_arrays(self) -> Tuple['CSRGraph', 'PickupTable']:
+        """
+        Function Description: This function returns the roads and pickups of the city as compact arrays, converting them from lists if the city is not already compact
+
+        Time Complexity: O(1) if the city is compact, otherwise O(|R| + |L|), where |R| is the number of roads and |L| is the number of locations
+        """
+        if self.compact:
+            return self.roads, self.pickups
+        return CSRGraph.from_adjacency(self.roads), PickupTable.from_list(self.pickups)
+
+    def save(self, path: str) -> None:
+        """
+        Function Description: This function writes the city to a file in a versioned binary format that load can map back into memory
+
+        Approach Description: The file starts with a magic string, the format version and the length of a JSON header. The header holds the small values, such as the friends, the largest road time and the chosen queue, and the position, size and type of every array. The compact road and pickup arrays, the tracks, and the landmark and contraction hierarchy arrays if they have been built, then follow in the order listed in the header, each starting on an 8 byte boundary so it can be viewed in place once mapped.
+
+        Input:
+            path: a string representing the file to write
+
+        Time Complexity: O(|R| + |L| + |T|) plus the size of any landmarks or hierarchy, where |R| is the number of roads, |L| is the number of locations and |T| is the number of tracks
+        """
+        roads, pickups = self.compact_arrays()
+        arrays = {'road_offsets': roads.offsets, 'road_targets': roads.targets, 'road_weights': roads.weights, 'pickup_offsets': pickups.offsets, 'pickup_friend_ids': pickups.friend_ids, 'pickup_depths': pickups.depths}
+        header = {'locations': self.locations, 'max_tracks': self.max_tracks, 'max_road_time': self.max_road_time, 'queue': self.queue, 'friend_names': pickups.friend_names, 'friends': self.friends, 'tracks': self.tracks is not None, 'landmarks': None, 'hierarchy': None}
+        if self.tracks is not None:
+            arrays['track_sources'] = array('q', (u for u, _, _ in self.tracks))
+            arrays['track_targets'] = array('q', (v for _, v, _ in self.tracks))
+            arrays['track_times'] = array('q' if all(isinstance(m, int) for _, _, m in self.tracks) else 'd', (m for _, _, m in self.tracks))
+        if self.landmarks is not None:
+            header['landmarks'] = self.landmarks.locations
+            for i, table in enumerate(self.landmarks.tables):
+                arrays[f'landmark_{i}'] = table
+        if self.hierarchy is not None:
+            header['hierarchy'] = self.hierarchy.witness_limit
+            for name in ('rank', 'offsets', 'targets', 'weights', 'middles'):
+                arrays[f'hierarchy_{name}'] = getattr(self.hierarchy, name)
+
+        # Lay the arrays out one after another on 8 byte boundaries
+        header['arrays'] = {}
+        position = 0
+        for name, buffer in arrays.items():
+            view = memoryview(buffer)
+            header['arrays'][name] = (position, view.nbytes, view.format)
+            position += -(-view.nbytes // 8) * 8
+        encoded = json.dumps(header).encode()
+        data_start = -(-(len(FORMAT_MAGIC) + 8 + len(encoded)) // 8) * 8
+
+        with open(path, 'wb') as file:
+            file.write(FORMAT_MAGIC)
+            file.write(struct.pack('<II', FORMAT_VERSION, len(encoded)))
+            file.write(encoded)
+            for name, buffer in arrays.items():
+                file.write(bytes(data_start + header['arrays'][name][0] - file.tell()))
+                file.write(memoryview(buffer).cast('B'))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, cache_size: int = 0, vectorized: bool = False) -> 'CityMap':
+        """
+        Function Description: This function reads a city written by save
 
-        # Populate the graph with possible friends to pick up at each location, has to be repeated 3 times to ensure that no matter in the input order of the tracks.
-        # Using the example tracks, roads and only Grizz from the assignment brief, if the tracks were inputed in order 4 -> 5, 3 -> 4, 1 -> 3, the only pickup location that would be updated would be 3 as the method only checks the immediate next location. Repeating the method 3 times ensures that the all pickup locations are updated correctly.
-        for u, v, _ in tracks+tracks+tracks:
-            cur_friend = self.graph[u][1]
-            next_friend = self.graph[v][1]
-            if cur_friend[0] is not None and cur_friend[1] != 2 and (next_friend[0] is None or cur_friend[1]+1 < next_friend[1]):
-                self.graph[v][1] = (cur_friend[0], cur_friend[1]+1)
+        Approach Description: The header is read and checked, then each array is viewed in place in a private copy on write mapping of the file, so loading does not read or copy the arrays and processes loading the same file share its page cached pages until they change them. If mmap is false the arrays are read into memory instead. The city is then created over the arrays with from_arrays, along with any landmarks and contraction hierarchy that were saved.
 
-    def dijkstra(self, start: int, construct_path: bool = False, destination: int = 0) -> Tuple[List[int], List[int]]:
+        Input:
+            path: a string representing the file to read
+            mmap: a boolean representing whether the file should be mapped rather than read
+            cache_size: an integer representing the amount of shortest path trees kept in the search cache
+            vectorized: a boolean representing whether plan and plan_many should scan the pickups with NumPy
+
+        Output: The CityMap
+
+        Time Complexity: O(|F| + |T|) when mapped, as only the friends and tracks become Python objects, where |F| is the number of friends and |T| is the number of tracks
         """
-        Function Description: This function finds the cost to travel to each location from the start location and optionally constructs the path to the destination
+        with open(path, 'rb') as file:
+            if file.read(len(FORMAT_MAGIC)) != FORMAT_MAGIC:
+                raise ValueError(f'{path} is not a saved CityMap')
+            version, header_length = struct.unpack('<II', file.read(8))
+            if version != FORMAT_VERSION:
+                raise ValueError(f'{path} uses CityMap format version {version}, only version {FORMAT_VERSION} is supported')
+            header = json.loads(file.read(header_length))
+            data_start = -(-(len(FORMAT_MAGIC) + 8 + header_length) // 8) * 8
+            if mmap:
+                data = memoryview(memory_map(file.fileno(), 0, access=ACCESS_COPY))
+            else:
+                file.seek(0)
+                data = memoryview(file.read())
+
+        def view(name: str):
+            position, nbytes, typecode = header['arrays'][name]
+            buffer = data[data_start+position:data_start+position+nbytes].cast(typecode)
+            return buffer if mmap else array(typecode, buffer)
+
+        roads = CSRGraph(view('road_offsets'), view('road_targets'), view('road_weights'))
+        pickups = PickupTable(view('pickup_offsets'), view('pickup_friend_ids'), view('pickup_depths'), header['friend_names'])
+        tracks = list(zip(view('track_sources'), view('track_targets'), view('track_times'))) if header['tracks'] else None
+        friends = [tuple(friend) for friend in header['friends']] if header['friends'] is not None else None
+        city_map = cls.from_arrays(roads, pickups, cache_size, tracks, friends, header['max_tracks'], vectorized, header['queue'], header['max_road_time'])
+        if header['landmarks'] is not None:
+            city_map.landmarks = Landmarks(header['landmarks'], [view(f'landmark_{i}') for i in range(len(header['landmarks']))])
+        if header['hierarchy'] is not None:
+            city_map.hierarchy = ContractionHierarchy.from_arrays(*(view(f'hierarchy_{name}') for name in ('rank', 'offsets', 'targets', 'weights', 'middles')), header['hierarchy'])
+        return city_map
+
+    def dijkstra(self, start: int, destination: Optional[int] = None, queue: Optional[str] = None, stats: Optional['SearchStats'] = None) -> 'ShortestPathTree':
+        """
+        Function Description: This function finds the cost to travel to each location from the start location and returns it as a shortest path tree
 
-        Approach Description: The function uses Dijkstra's algorithm to find the shortest path to each location from the start location. It uses a min heap to store the distances to each location and the previous location to construct the path if needed. The function then constructs the path to the destination if needed.
+        Approach Description: The function uses Dijkstra's algorithm to find the shortest path to each location from the start location. It uses a priority queue to store the distances to each location and records the previous location of each location as it is relaxed. Rather than constructing a single path, the distances and previous locations are returned as a ShortestPathTree so that the path to any location can be extracted lazily later on without searching again. If a destination is given the search stops as soon as the destination is settled, as its distance and path can no longer change. The priority queue is either the MinHeap with lazy deletion, an IndexedMinHeap with true decrease key, or a BucketQueue for small integer road times, chosen at construction from the road times unless one is given.
 
         Input:
             start: an integer representing the starting location
-            construct_path: a boolean representing whether the path to the destination should be constructed
-            destination: an integer representing the destination location
+            destination: an optional integer representing a location after which the search can stop
+            queue: an optional string, 'heap', 'indexed' or 'bucket', representing the priority queue to use instead of the one chosen for the city
+            stats: an optional SearchStats which is filled in with the locations settled, the stale queue entries skipped and the roads relaxed, when none is given nothing is counted
 
-        Output: A tuple containing a list of integers representing the distances to each location from the start location and a list of integers representing the path from the start to the destination
+        Output: A ShortestPathTree rooted at the start location containing the distances and previous locations of each location
 
         Time Complexity: O(|R|log(|L|)), Θ(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
 
         Time Complexity Analysis: Given |R| is the number of roads and |L| is the number of locations
             The initialisation of the distances list costs O(|L|) as it creates a list of size |L|
-            The initialisation of the min heap costs O(1) as it creates a min heap
             The initialisation of the previous list costs O(|L|) as it creates a list of size |L|
-            Inside of the while loop, each call of the get_min function costs O(log(|L|)) as it removes the minimum element from the heap
-            The get_min function is called for each road, therefore the time complexity of the while loop is O(|R|log(|L|))
-            The path reconstruction costs O(|L|) as it iterates through each location to construct the path
-            The time complexity is therefore O(|L|) + O(1) + O(|L|) + O(|R|log(|L|)) + O(|L|)
+            Inside of the while loop, each call of the pop function costs O(log(|L|)) as it removes the minimum element from the heap
+            The pop function is called for each road, therefore the time complexity of the while loop is O(|R|log(|L|))
+            With the bucket queue each pop instead costs O(1) amortised plus one step per unit of distance, making the while loop O(|R| + D) where D is the largest distance found
             O(|L|) <= O(|R|) as defined in the assignmnent brief, therefore the time complexity is O(|R|log(|L|))
 
-            The big Θ notation is the same as the big O notation as the time complexity is the same in the best and worst case scenarios
+            The big Θ notation is the same as the big O notation when no destination is given, as the whole graph is then settled
 
         Auxiliary Space Complexity: O(|L|), Θ(|L|) where |L| is the number of locations
 
-        Auxiliary Space Complexity Analysis: Given |R| is the number of roads and |L| is the number of locations
-            The distances list requires O(|L|) auxilary space as it creates a list of length |L|
-            The min heap requires O(|L|) auxilary space as it creates an array of length |L|
-            The previous list requires O(|L|) auxilary space as it creates a list of length |L|
-            The path list requires O(|L|) auxilary space as it creates a list of length |L|
-            The time complexity is therefore O(|L|) + O(|L|) + O(|L|) + O(|L|) = O(|L|)
-
-            The big Θ notation is the same as the big O notation as the auxiliary space complexity is the same in the best and worst case scenarios
+        Auxiliary Space Complexity Analysis: Given |L| is the number of locations
+            The distances list and the previous list each require O(|L|) auxilary space, these are kept by the returned tree
+            The priority queue requires O(|L|) auxilary space, it is kept by the thread's search workspace and cleared for each search rather than made again
+            The auxiliary space complexity is therefore O(|L|)
 
         Space Complexity: O(|L|), Θ(|L|) where |L| is the number of locations
 
         Space Complexity Analysis: Given |L| is the number of locations
-            The start, construct_path, and destination inputs require O(1) space
+            The start and destination inputs require O(1) space
             The space complexity of the function is the auxiliary space complexity plus O(1) which is O(|L|)
-
-            The big Θ notation is the same as the big O notation as the space complexity is the same in the best and worst case scenarios
         """
-        # Initialise the distances and min heap
+        # Initialise the distances and previous locations, which are kept by the tree, and take the priority queue from this thread's workspace unless another kind is asked for
         distances = [float('inf') for _ in range(self.locations+1)]
         distances[start] = 0
-        min_heap = MinHeap(self.locations+1)
-        min_heap.add((0, start))
-        # Initialise the previous list if the path is to be constructed
-        previous = [ None for _ in range(self.locations+1) ] if construct_path else None
+        previous = [None for _ in range(self.locations+1)]
+        if queue is None or queue == self.queue:
+            priority_queue = self._workspaces(1)[0].queue
+            priority_queue.clear()
+        else:
+            priority_queue = self._priority_queue(queue)
+        priority_queue.push(0, start)
+        if stats is not None:
+            began = perf_counter()
 
         # Dijkstra's algorithm
-        while min_heap:
-            current_dist, current_loc = min_heap.get_min()
-
-            # Break if the destination is reached and the path is to be constructed
-            if current_loc == destination and len(self.graph[current_loc][0]) == 1 and construct_path:
-                break
+        while priority_queue:
+            current_dist, current_loc = priority_queue.pop()
 
             # Skip if the distance is greater than the current distance
             if current_dist > distances[current_loc]:
+                if stats is not None:
+                    stats.stale += 1
                 continue
 
+            # Break if the destination has been settled as its distance and path can no longer change
+            if current_loc == destination:
+                if stats is not None:
+                    stats.settled += 1
+                break
+
+            # Count the settled location and the roads about to be relaxed, only when asked to
+            if stats is not None:
+                stats.settled += 1
+                stats.relaxed += self.roads.degree(current_loc) if self.compact else len(self.roads[current_loc])
+
             # Check each neighbor to see if the current path to that neighbor is shorter than the current distance
-            for neighbor, weight in self.graph[current_loc][0]:
+            for neighbor, weight in self.roads[current_loc]:
                 distance = current_dist + weight
                 if distance < distances[neighbor]:
                     distances[neighbor] = distance
-                    min_heap.add((distance, neighbor))
-                    if construct_path:
-                        previous[neighbor] = current_loc
+                    previous[neighbor] = current_loc
+                    priority_queue.push(distance, neighbor)
+
+        if stats is not None:
+            stats.seconds += perf_counter() - began
+        return ShortestPathTree(start, distances, previous)
+
+    def _workspaces(self, count: int) -> List['SearchWorkspace']:
+        # The search workspaces of the calling thread, made again when the city has grown or changed its priority queue since they were made
+        local = self.workspaces
+        key = (self.locations, self.queue, self.max_road_time)
+        if getattr(local, 'key', None) != key:
+            local.key = key
+            local.workspaces = []
+        while len(local.workspaces) < count:
+            local.workspaces.append(SearchWorkspace(self.locations+1, self._priority_queue(self.queue)))
+        return local.workspaces[:count]
+
+    def _priority_queue(self, kind: str):
+        if kind == 'heap':
+            return MinHeap(self.locations+1)
+        if kind == 'indexed':
+            return IndexedMinHeap(self.locations+1)
+        if kind == 'bucket':
+            return BucketQueue(self.max_road_time)
+        raise ValueError(f'Unknown priority queue {kind!r}')
+
+    def _choose_queue(self) -> str:
+        """
+        Function Description: This function finds the largest road time and chooses the priority queue for the dijkstra function
 
-        # Construct the path if needed
-        path = []
-        while destination is not None and construct_path:
-            path.append(destination)
-            destination = previous[destination]
-        
-        return distances, path[::-1]
+        Approach Description: A bucket queue needs one bucket per unit of road time and integer distances, so it is chosen when every road time is an integer no larger than BUCKET_QUEUE_LIMIT, otherwise the indexed min heap is chosen as it never holds more than one entry per location
+
+        Time Complexity: O(|R|), where |R| is the number of roads
+        """
+        if self.compact:
+            self.max_road_time = max(self.roads.weights, default=0)
+            integral = memoryview(self.roads.weights).format == 'q'
+        else:
+            self.max_road_time = max((m for edges in self.roads for _, m in edges), default=0)
+            integral = all(isinstance(m, int) for edges in self.roads for _, m in edges)
+        return 'bucket' if integral and self.max_road_time <= BUCKET_QUEUE_LIMIT else 'indexed'
 
-    def reconstruct_path(self, start: int, stop: int, destination: int) -> List[int]:
+    def reconstruct_path(self, start: int, stop: int, destination: int, start_tree: Optional['ShortestPathTree'] = None, destination_tree: Optional['ShortestPathTree'] = None) -> List[int]:
         """
         Function Description: This function reconstructs the path from the start to the destination via the stop
 
-        Approach Description: The function uses the dijkstra function to find the path from the start to the stop and the stop to the destination. It then combines the two paths to create the path from the start to the destination.
+        Approach Description: The path from the start to the stop is extracted from the shortest path tree rooted at the start. As roads are undirected, the path from the stop to the destination is the reverse of the path from the destination to the stop, which is extracted from the shortest path tree rooted at the destination. If either tree is not given its leg is found as a point to point shortest path instead, which uses the contraction hierarchy if one has been built.
 
         Input:
             start: an integer representing the starting location
             stop: an integer representing the stopping location
             destination: an integer representing the destination location
+            start_tree: an optional ShortestPathTree rooted at the start location
+            destination_tree: an optional ShortestPathTree rooted at the destination location
 
         Output: A list of integers representing the path from the start to the destination via the stop
 
-        Time Complexity: O(|R|log(|L|)), Θ(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
+        Time Complexity: O(|L|) when both trees are given, otherwise O(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
 
         Time Complexity Analysis: Given |R| is the number of roads and |L| is the number of locations
-            The dijkstra function is called twice, therefore the time complexity is O(2*|R|log(|L|)) or O(|R|log(|L|))
-            The pop function is called on the stop_to_destination list with a time complexity is O(1)
-            The time complexity is therefore O(|R|log(|L|))
-
-            The big Θ notation is the same as the big O notation as the time complexity is the same in the best and worst case scenarios
+            Each missing leg is found with the shortest_path function, costing at most O(|R|log(|L|))
+            Extracting each path from a tree costs O(|L|) as a path visits each location at most once
+            The time complexity is therefore O(|L|) if both trees are given and O(|R|log(|L|)) otherwise
 
         Auxiliary Space Complexity: O(|L|), Θ(|L|), where |L| is the number of locations
-        
-        Auxiliary Space Complexity Analysis: Given |R| is the number of roads and |L| is the number of locations
-            The dijkstra function requires O(|L|) auxilary space as it creates a list of length |L|
-            The time complexity is therefore O(|L|) - 1 + O(|L|) = O(|L|)
 
-            The big Θ notation is the same as the big O notation as the auxiliary space complexity is the same in the best and worst case scenarios
+        Auxiliary Space Complexity Analysis: Given |L| is the number of locations
+            The shortest_path function and both extracted paths require O(|L|) auxilary space
+            The auxiliary space complexity is therefore O(|L|)
 
         Space Complexity: O(|L|), Θ(|L|), where |L| is the number of locations
 
         Space Complexity Analysis: Given |L| is the number of locations
-            The start, stop, and destination inputs require O(1) space
-            The space complexity of the function is the auxiliary space complexity plus O(1) which is O(|L|)
-
-            The big Θ notation is the same as the big O notation as the space complexity is the same in the best and worst case scenarios
+            The start, stop, and destination inputs require O(1) space and the trees, if given, require O(|L|) space
+            The space complexity of the function is therefore O(|L|)
         """
-        start_to_stop = self.dijkstra(start, True, stop)[1]
+        start_to_stop = start_tree.path_to(stop) if start_tree is not None else self.shortest_path(start, stop)[1]
         start_to_stop.pop()
-        stop_to_destination = self.dijkstra(stop, True, destination)[1]
+        stop_to_destination = destination_tree.path_from(stop) if destination_tree is not None else self.shortest_path(destination, stop)[1][::-1]
         return start_to_stop + stop_to_destination
 
-    def plan(self, start: int, destination: int) -> Tuple[int, List[int], str, int]:
+    def shortest_path(self, start: int, destination: int) -> Tuple[float, List[int]]:
+        """
+        Function Description: This function finds the shortest time and path from the start to the destination
+
+        Approach Description: If a contraction hierarchy has been built the query is answered with its bidirectional upward search. Otherwise, if landmarks have been built, an A* search is run from the start using the landmark lower bounds on the remaining time to the destination, which settles the locations roughly in the direction of the destination first. Without either a Dijkstra search is run from the start in this thread's reused workspace until the destination is settled.
+
+        Input:
+            start: an integer representing the starting location
+            destination: an integer representing the destination location
+
+        Output: A tuple containing the shortest time from the start to the destination and a list of integers representing the path
+
+        Time Complexity: O(|R|log(|L|)) without a hierarchy, where |R| is the number of roads and |L| is the number of locations, and the size of the two upward search spaces with one
+        """
+        if self.hierarchy is not None:
+            return self.hierarchy.shortest_path(start, destination)
+        if self.landmarks is not None:
+            return self._landmark_search(start, destination)
+        return self._search_to(start, destination)
+
+    def build_landmarks(self, count: int = 8) -> 'Landmarks':
+        """
+        Function Description: This function chooses landmarks and precomputes the time from each of them to every location, which shortest_path and reconstruct_path then use to direct their searches
+
+        Approach Description: The first landmark is the location furthest from location 0, each next landmark is the location furthest from all the landmarks chosen so far, so the landmarks end up spread around the edge of the city where their lower bounds are tightest. The shortest path tree from each landmark is found with the dijkstra function and its distances are kept.
+
+        Input:
+            count: an integer representing the amount of landmarks
+
+        Output: The Landmarks, which are also kept as self.landmarks
+
+        Time Complexity: O(k·|R|log(|L|)), where k is the amount of landmarks, |R| is the number of roads and |L| is the number of locations
+
+        Auxiliary Space Complexity: O(k·|L|), as the distance from each landmark to every location is kept
+        """
+        locations = []
+        tables = []
+        closest = self.dijkstra(0).distances
+        for _ in range(min(count, self.locations+1)):
+            landmark = max(range(self.locations+1), key=lambda location: closest[location])
+            distances = self.dijkstra(landmark).distances
+            locations.append(landmark)
+            tables.append(array('d', distances))
+            closest = [min(a, b) for a, b in zip(closest, distances)]
+        self.landmarks = Landmarks(locations, tables)
+        return self.landmarks
+
+    def _landmark_search(self, start: int, destination: int) -> Tuple[float, List[int]]:
+        """
+        Function Description: This function finds the shortest time and path from the start to the destination with an A* search guided by the landmark lower bounds
+
+        Approach Description: Each location is keyed in the min heap by its time from the start plus the landmark lower bound on its time to the destination. The bound is consistent, so each location is settled at most once and the search stops as soon as the destination is settled. Only the locations reached are stored, in dictionaries, so the cost is proportional to the part of the city explored.
+
+        Time Complexity: O(|R|log(|L|)) in the worst case, where |R| is the number of roads and |L| is the number of locations, and usually a small fraction of it
+        """
+        bound = self.landmarks.lower_bound_to(destination)
+        distances = {start: 0}
+        previous = {start: None}
+        settled = set()
+        min_heap = MinHeap(1)
+        min_heap.add((bound(start), start))
+
+        # A* search
+        while min_heap:
+            _, current_loc = min_heap.get_min()
+            if current_loc in settled:
+                continue
+            settled.add(current_loc)
+            if current_loc == destination:
+                break
+            current_dist = distances[current_loc]
+            for neighbor, weight in self.roads[current_loc]:
+                distance = current_dist + weight
+                if distance < distances.get(neighbor, float('inf')):
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_loc
+                    min_heap.add((distance + bound(neighbor), neighbor))
+
+        # Construct the path from the previous locations, which is just the destination if it cannot be reached
+        path = []
+        location = destination
+        while location is not None:
+            path.append(location)
+            location = previous.get(location)
+        return distances.get(destination, float('inf')), path[::-1]
+
+    def build_contraction_hierarchy(self, witness_limit: int = 64) -> 'ContractionHierarchy':
+        """
+        Function Description: This function builds a contraction hierarchy over the roads, which shortest_path and reconstruct_path then use for point to point queries
+
+        Approach Description: See ContractionHierarchy, the hierarchy only depends on the roads so it stays valid until the roads change
+
+        Input:
+            witness_limit: an integer representing the amount of locations each witness search may settle before a shortcut is added anyway
+
+        Output: The ContractionHierarchy, which is also kept as self.hierarchy
+        """
+        self.hierarchy = ContractionHierarchy(self.roads, witness_limit)
+        return self.hierarchy
+
+    def build_pickup_index(self) -> 'PickupIndex':
+        """
+        Function Description: This function builds the index of the nearest pickup location to every location, which plan, bounded plans and closest_friend then use
+
+        Approach Description: See PickupIndex, the index is updated when friends move or tracks are added and dropped when the roads change
+
+        Output: The PickupIndex, which is also kept as self.pickup_index
+        """
+        self.pickup_index = PickupIndex(self.roads, self._pickup_depths())
+        return self.pickup_index
+
+    def closest_friend(self, location: int) -> Tuple[float, Optional[str], Optional[int]]:
+        """
+        Function Description: This function finds the friend who can be picked up soonest from a location
+
+        Approach Description: The nearest pickup location is looked up in the pickup index, which is built first if it has not been. Of friends equally far away the one with fewer tracks and then the lower pickup location is chosen, as in the plan function.
+
+        Input:
+            location: an integer representing the location to travel from
+
+        Output: A tuple containing the time to the pickup location, the friend to pick up and the pickup location, or infinity and None if no friend can be reached
+
+        Time Complexity: O(1) once the index is built
+        """
+        if self.pickup_index is None:
+            self.build_pickup_index()
+        time, pickup, _ = self.pickup_index.nearest_pickup(location)
+        if pickup is None:
+            return time, None, None
+        return time, self.pickups[pickup][0][0], pickup
+
+    def distance_matrix(self, sources: Iterable[int], targets: Iterable[int], pickups: bool = False) -> 'DistanceMatrix':
+        """
+        Function Description: This function finds the shortest time between each source and each target, and optionally the time of the best plan between them
+
+        Approach Description: If a contraction hierarchy has been built the times are found with its bucket based many to many search, which only searches the small upward search space of each source and target once. Otherwise a Dijkstra search is run from each distinct source, stopping as soon as every target has been settled. The time of the best plan is the smallest sum of the times from the source and the target to a pickup location. The times from each target to the pickup locations are found first, from the hierarchy or from a full search, and those of each source are then added to them in turn, with NumPy when it is installed. Only these rows are kept, never the full searches.
+
+        Input:
+            sources: an iterable of integers representing the locations of the rows
+            targets: an iterable of integers representing the locations of the columns
+            pickups: a boolean representing whether to also find the time of the best plan from each source to each target, as the plan function would
+
+        Output: A DistanceMatrix holding the times row by row in one flat array
+
+        Time Complexity: O(|S|·|R|log(|L|)) without a hierarchy, where |S| is the number of distinct sources, |R| is the number of roads and |L| is the number of locations, much less with a hierarchy or when the targets are close to the sources, plus O((|S| + |T|)·|R|log(|L|) + |S|·|T|·P) for the pickup times without a hierarchy, where P is the number of pickup locations
+
+        Auxiliary Space Complexity: O(|S|·|T| + |T|·P + |L|)
+        """
+        sources, targets = list(sources), list(targets)
+        if self.hierarchy is not None:
+            times = self.hierarchy.distance_table(sources, targets)
+        else:
+            times = array('d')
+            rows = {}
+            for source in sources:
+                if source not in rows:
+                    rows[source] = self._search_targets(source, targets)
+                times.extend(rows[source])
+        return DistanceMatrix(sources, targets, times, self._pickup_table(sources, targets) if pickups else None)
+
+    def _search_targets(self, source: int, targets: List[int]) -> List[float]:
+        # Dijkstra's algorithm from the source in this thread's workspace, stopping once every target has been settled
+        workspace = self._workspaces(1)[0]
+        generation = workspace.start(source)
+        stamps, distances, queue = workspace.stamps, workspace.distances, workspace.queue
+        unsettled = set(targets)
+        while queue and unsettled:
+            current_dist, current_loc = queue.pop()
+            if current_dist > distances[current_loc]:
+                continue
+            unsettled.discard(current_loc)
+            for neighbor, weight in self.roads[current_loc]:
+                distance = current_dist + weight
+                if stamps[neighbor] != generation or distance < distances[neighbor]:
+                    stamps[neighbor] = generation
+                    distances[neighbor] = distance
+                    queue.push(distance, neighbor)
+        return [workspace.distance(target) for target in targets]
+
+    def _search_to(self, start: int, destination: int) -> Tuple[float, List[int]]:
+        # Dijkstra's algorithm from the start in this thread's workspace, stopping once the destination has been settled
+        workspace = self._workspaces(1)[0]
+        generation = workspace.start(start)
+        stamps, distances, previous, queue = workspace.stamps, workspace.distances, workspace.previous, workspace.queue
+        while queue:
+            current_dist, current_loc = queue.pop()
+            if current_dist > distances[current_loc]:
+                continue
+            if current_loc == destination:
+                break
+            for neighbor, weight in self.roads[current_loc]:
+                distance = current_dist + weight
+                if stamps[neighbor] != generation or distance < distances[neighbor]:
+                    stamps[neighbor] = generation
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_loc
+                    queue.push(distance, neighbor)
+        return workspace.distance(destination), workspace.path_to(destination)
+
+    def _pickup_table(self, sources: List[int], targets: List[int]) -> array:
+        # The time of the best plan from each source to each target, row by row, as the smallest sum of their times to each pickup location
+        locations = [location for location, depth in enumerate(self._pickup_depths()) if depth is not None]
+
+        def pickup_rows(points):
+            # The times from each point to the pickup locations, from the hierarchy when one is built and otherwise from a full search of each point
+            if self.hierarchy is not None:
+                table = self.hierarchy.distance_table(points, locations)
+                return (table[i*len(locations):(i+1)*len(locations)] for i in range(len(points)))
+            return (array('d', [distances[location] for location in locations]) for distances in (self.shortest_path_tree(point).distances for point in points))
+
+        target_rows = list(pickup_rows(targets))
+        times = array('d')
+        if np is not None and locations and targets:
+            target_matrix = np.array([np.frombuffer(row, dtype=np.float64) for row in target_rows])
+            for row in pickup_rows(sources):
+                times.frombytes((np.frombuffer(row, dtype=np.float64) + target_matrix).min(axis=1).tobytes())
+            return times
+        for row in pickup_rows(sources):
+            times.extend(min((a + b for a, b in zip(row, target_row)), default=float('inf')) for target_row in target_rows)
+        return times
+
+    def plan(self, start: int, destination: int, stats: Optional['PlanStats'] = None, bounded: bool = False) -> Tuple[int, List[int], str, int]:
         """
         Function Description: This function finds the best friend to pick up and the best location to pick them up from
 
-        Approach Description: The function uses Dijkstra's algorithm to find the shortest path to each location from the start location and the destination location. It then iterates through each road to find the friend with the shortest distance to the start location and the destination location. It then returns the time taken to pick up the friend, the path to the destination, the friend to pick up, and the location to pick them up from.
+        Approach Description: The function uses Dijkstra's algorithm to find the shortest path tree from the start location and from the destination location, reusing trees held in the search cache. It then iterates through each location to find the friend with the shortest distance to the start location and the destination location. The path is then built from the two trees that were already found, rather than searching again, and it returns the time taken to pick up the friend, the path to the destination, the friend to pick up, and the location to pick them up from.
 
         Input:
             start: an integer representing the starting location
             destination: an integer representing the destination location
+            stats: an optional PlanStats which is filled in with the counters of both searches and the time spent searching, scanning the pickups and reconstructing the path
+            bounded: a boolean representing whether to use the bounded search of _plan_bounded, which stops both searches as soon as no pickup can beat the best one found, instead of searching the whole city twice
 
         Output: A tuple containing an integer representing the time taken to pick up the friend, a list of integers representing the path to the destination, a string representing the friend to pick up, and an integer representing the location to pick them up from
 
         Time Complexity: O(|R|log(|L|)), Θ(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
         
         Time Complexity Analysis: Given |R| is the number of roads and |L| is the number of locations
-            The dijkstra function is called twice, therefore the time complexity is O(2*|R|log(|L|)) or O(|R|log(|L|))
-            The time complexity of the for loop is O(|R|) as it iterates through all the roads
-            The reconstruct_path function is called with a time complexity of O(|R|log(|L|))
+            The dijkstra function is called at most twice, therefore the time complexity is O(2*|R|log(|L|)) or O(|R|log(|L|))
+            The time complexity of the for loop is O(|L|) as it iterates through all the locations
+            The reconstruct_path function is given both trees and costs O(|L|)
             The time complexity is therefore O(|R|log(|L|))
 
             The big Θ notation is the same as the big O notation as the time complexity is the same in the best and worst case scenarios
@@ -220,9 +787,9 @@ class CityMap:
         
         Auxiliary Space Complexity Analysis: Given |L| is the number of locations
             min_time, best_friend, best_depth, and best_pickup_location require O(1) auxilary space
-            The dijkstra function which is called twice requires O(|L|) auxilary space as it creates a list of length |L| and is therefore O(|L|) + O(|L|) = O(|L|)
+            The two shortest path trees each require O(|L|) auxilary space
             The reconstruct_path function requires O(|L|) auxilary space as it creates a list of length |L|
-            The time complexity is therefore O(1) + O(|L|) + O(|L|) = O(|L|)
+            The auxiliary space complexity is therefore O(1) + O(|L|) + O(|L|) = O(|L|)
 
             The big Θ notation is the same as the big O notation as the auxiliary space complexity is the same in the best and worst case scenarios
 
@@ -234,26 +801,1637 @@ class CityMap:
 
             The big Θ notation is the same as the big O notation as the space complexity is the same in the best and worst case scenarios
         """
+        # Sample the plan for the stats hook if one is set
+        if stats is None and self.stats_hook is not None and random.random() < self.stats_sample_rate:
+            stats = PlanStats()
+
+        # A round trip is answered from the pickup index, only searching as far as the nearest pickup location for the path
+        if start == destination and self.pickup_index is not None:
+            if stats is None:
+                return self._plan_round_trip(start)
+            began = perf_counter()
+            result = self._plan_round_trip(start)
+            stats.timings['pickup_index'] = perf_counter() - began
+            if self.stats_hook is not None:
+                self.stats_hook(stats)
+            return result
+
+        if bounded:
+            return self._plan_bounded(start, destination, stats)
+
+        # Find the shortest path trees from the start and from the destination
+        if stats is None:
+            start_tree = self.shortest_path_tree(start)
+            destination_tree = self.shortest_path_tree(destination)
+            return self._plan_with_trees(start, destination, start_tree, destination_tree)
+
+        # The same steps as above, timing each phase
+        began = perf_counter()
+        start_tree = self.shortest_path_tree(start, stats.start_search)
+        searched_start = perf_counter()
+        destination_tree = self.shortest_path_tree(destination, stats.destination_search)
+        searched_destination = perf_counter()
+        location = self._find_pickup(start_tree, destination_tree)
+        scanned = perf_counter()
+        result = self._plan_result(start, destination, start_tree, destination_tree, location)
+        finished = perf_counter()
+        stats.timings.update(start_search=searched_start - began, destination_search=searched_destination - searched_start, pickup_scan=scanned - searched_destination, reconstruct_path=finished - scanned)
+        if self.stats_hook is not None:
+            self.stats_hook(stats)
+        return result
+
+    def _plan_round_trip(self, start: int) -> Tuple[int, List[int], str, int]:
+        # The best plan from the start back to itself picks up at the nearest pickup location, with the same ties broken, there and back along the same path
+        time, location, _ = self.pickup_index.nearest_pickup(start)
+        if location is None:
+            # If no pickup location can be reached every time is infinite, so the plan function chooses by amount of tracks, then location, with a path of just the location
+            depths = self._pickup_depths()
+            location = min((location for location, depth in enumerate(depths) if depth is not None), key=lambda location: (depths[location], location), default=None)
+            if location is None:
+                return (float('inf'), None, None, None)
+            return (float('inf'), [location], self.pickups[location][0][0], location)
+        path = self._search_to(start, location)[1]
+        return (time + time, path[:-1] + path[::-1], self.pickups[location][0][0], location)
+
+    def _plan_bounded(self, start: int, destination: int, stats: Optional['PlanStats'] = None) -> Tuple[int, List[int], str, int]:
+        """
+        Function Description: This function finds the same plan as the plan function, searching from the start and the destination only as far as needed to be sure of it
+
+        Approach Description: Two Dijkstra searches, one from the start and one from the destination, are expanded in turn, always expanding the one with the smaller radius, the distance of the location it settled last. Whenever a search reaches a pickup location the other search has a distance to, the sum is an upper bound on the best time. A pickup location not yet settled by either search is at least the sum of both radii away, and one settled by only one search is at least its settled distance plus the other radius away, where a radius is raised to the time to the nearest pickup location if the pickup index has been built, the smallest of which is the earliest settled one still waiting for the other search. Once every such lower bound is strictly greater than the upper bound, every pickup location which could tie the best time has been settled by both searches with its exact times, so the pickup is chosen among them by time, then amount of tracks, then location exactly as the plan function does. Both searches run in this thread's reused workspaces, so they are not kept in the search cache.
+
+        Input:
+            start: an integer representing the starting location
+            destination: an integer representing the destination location
+            stats: an optional PlanStats which is filled in with the counters of both searches
+
+        Output: The same tuple as the plan function
+
+        Time Complexity: O(|R|log(|L|)) in the worst case, where |R| is the number of roads and |L| is the number of locations, but only the locations within the radii of the searches are settled, which for a nearby pickup is a small part of the city
+
+        Auxiliary Space Complexity: O(|L|), for the workspaces of both searches, which are kept by the thread and reused so that a search costs as much as the locations it reaches
+        """
+        if stats is not None:
+            began = perf_counter()
+        depths = self._pickup_depths()
+        infinity = float('inf')
+        searches = (stats.start_search, stats.destination_search) if stats is not None else None
+
+        # Start a search from the start and one from the destination in this thread's workspaces, the start's first and the destination's second
+        workspaces = self._workspaces(2)
+        generations = (workspaces[0].start(start), workspaces[1].start(destination))
+        stamps = (workspaces[0].stamps, workspaces[1].stamps)
+        distances = (workspaces[0].distances, workspaces[1].distances)
+        previous = (workspaces[0].previous, workspaces[1].previous)
+        settled = (workspaces[0].settled, workspaces[1].settled)
+        queues = (workspaces[0].queue, workspaces[1].queue)
+        radii = [0, 0]
+
+        # No pickup location is closer to the start or the destination than their nearest one in the pickup index, if it has been built
+        floors = (self.pickup_index.distances[start], self.pickup_index.distances[destination]) if self.pickup_index is not None else (0, 0)
+
+        # The pickup locations settled by one search in the order they were settled, with the position of the first one the other search has not settled, and those settled by both
+        waiting = ([], [])
+        heads = [0, 0]
+        meetings = []
+        best_time = infinity
+
+        while True:
+            # A search with an empty queue has settled everything it can reach, so the rest is infinitely far away
+            for side in (0, 1):
+                if not queues[side]:
+                    radii[side] = infinity
+
+            # Stop once no pickup location which is not settled by both searches can match the best time
+            lower = (max(radii[0], floors[0]), max(radii[1], floors[1]))
+            bound = lower[0] + lower[1]
+            for side in (0, 1):
+                pending, other_settled, other_generation = waiting[side], settled[1-side], generations[1-side]
+                while heads[side] < len(pending) and other_settled[pending[heads[side]]] == other_generation:
+                    heads[side] += 1
+                if heads[side] < len(pending):
+                    bound = min(bound, distances[side][pending[heads[side]]] + lower[1-side])
+            if bound > best_time or (not queues[0] and not queues[1]):
+                break
+
+            # Expand the search with the smaller radius
+            side = 0 if queues[0] and (radii[0] <= radii[1] or not queues[1]) else 1
+            generation, other_generation = generations[side], generations[1-side]
+            side_stamps, side_distances, side_previous, queue = stamps[side], distances[side], previous[side], queues[side]
+            other_stamps, other_distances = stamps[1-side], distances[1-side]
+            current_dist, current_loc = queue.pop()
+            if current_dist > side_distances[current_loc]:
+                if stats is not None:
+                    searches[side].stale += 1
+                continue
+            settled[side][current_loc] = generation
+            radii[side] = current_dist
+            if stats is not None:
+                searches[side].settled += 1
+                searches[side].relaxed += self.roads.degree(current_loc) if self.compact else len(self.roads[current_loc])
+
+            # Record a settled pickup location as waiting for the other search or as settled by both
+            if depths[current_loc] is not None:
+                if settled[1-side][current_loc] == other_generation:
+                    meetings.append(current_loc)
+                else:
+                    waiting[side].append(current_loc)
+                if other_stamps[current_loc] == other_generation:
+                    best_time = min(best_time, current_dist + other_distances[current_loc])
+
+            for neighbor, weight in self.roads[current_loc]:
+                distance = current_dist + weight
+                if side_stamps[neighbor] != generation or distance < side_distances[neighbor]:
+                    side_stamps[neighbor] = generation
+                    side_distances[neighbor] = distance
+                    side_previous[neighbor] = current_loc
+                    queue.push(distance, neighbor)
+                    if depths[neighbor] is not None and other_stamps[neighbor] == other_generation and distance + other_distances[neighbor] < best_time:
+                        best_time = distance + other_distances[neighbor]
+
+        # Choose the pickup exactly as _best_pickup does, by time, then amount of tracks, then location
+        # If no pickup location is reachable by both searches every time is infinite, so the plan function chooses by amount of tracks, then location
+        if meetings:
+            location = min(meetings, key=lambda location: (distances[0][location]+distances[1][location], depths[location], location))
+        else:
+            location = min((location for location, depth in enumerate(depths) if depth is not None), key=lambda location: (depths[location], location), default=None)
+        if stats is not None:
+            searched = perf_counter()
+
+        # Build the plan as _plan_result does, from the workspaces instead of trees
+        if location is None:
+            result = (infinity, None, None, None)
+        else:
+            friend, _ = self.pickups[location][0]
+            path = workspaces[0].path_to(location)[:-1] + workspaces[1].path_to(location)[::-1]
+            result = (workspaces[0].distance(location)+workspaces[1].distance(location), path, friend, location)
+        if stats is not None:
+            finished = perf_counter()
+            stats.timings.update(bounded_search=searched - began, reconstruct_path=finished - searched)
+            if self.stats_hook is not None:
+                self.stats_hook(stats)
+        return result
+
+    def _pickup_depths(self) -> List[Optional[int]]:
+        # The amount of tracks of the best pickup at each location, or None where there is none, found once per propagation
+        if self.pickup_depths is None:
+            self.pickup_depths = [pickups[0][1] if pickups else None for pickups in (self.pickups[location] for location in range(self.locations+1))]
+        return self.pickup_depths
+
+    def plan_many(self, queries: Iterable[Tuple[int, int]]) -> List[Tuple[int, List[int], str, int]]:
+        """
+        Function Description: This function plans a batch of (start, destination) queries and returns the plans in the order of the queries
+
+        Approach Description: The queries are grouped by their start location and the positions at which each endpoint is used in the batch are noted. Each shortest path tree is found through the shared search cache and held until its last use in the batch, after which it is released, so with enough room the amount of searches is the amount of distinct endpoints rather than twice the amount of queries. At most as many trees as the search cache holds, or the two trees of a single query when there is no cache, are held at once. When another tree is needed with no room left, the held tree whose next use is furthest away is released and searched again when it is next needed, which keeps the searches repeated to a minimum while memory follows the size of the cache rather than the batch.
+
+        Input:
+            queries: an iterable of tuples of integers representing the start and destination locations of each query
+
+        Output: A list of plans, as returned by the plan function, in the same order as the queries
+
+        Time Complexity: O(|S||R|log(|L|) + |Q||L|), where |S| is the number of searches, between the number of distinct endpoints and twice the number of queries, |Q| is the number of queries, |R| is the number of roads and |L| is the number of locations
+
+        Time Complexity Analysis: Given |S| is the number of searches, |Q| is the number of queries and |C| is the amount of trees which can be held
+            Noting the uses of each endpoint and grouping the queries costs O(|Q|log(|Q|)) due to the sort
+            Each search costs O(|R|log(|L|)), an endpoint is searched again only if it was released to make room, costing O(|S||R|log(|L|))
+            Choosing the tree to release costs O(|C|) and happens at most twice per query, which is O(|Q||L|) as |C| <= |L|
+            Each query then scans the pickups and builds its path, costing O(|Q||L|), where the scans of a block of queries are a single matrix operation if vectorized
+
+        Auxiliary Space Complexity: O(|C||L| + |Q|), where |C| is the larger of the size of the search cache and two
+
+        Auxiliary Space Complexity Analysis: Given |C| is the amount of trees which can be held and |Q| is the number of queries
+            At most |C| trees are held and at most |C| more are kept by the search cache, each requiring O(|L|) auxilary space
+            The order of queries, the positions of use and the plans require O(|Q|) auxilary space
+        """
+        # Note the positions at which each endpoint is used once the queries are ordered so queries sharing a start are planned together
+        queries = list(queries)
+        order = sorted(range(len(queries)), key=lambda index: queries[index])
+        uses = {}
+        for position, index in enumerate(order):
+            for endpoint in queries[index]:
+                uses.setdefault(endpoint, deque()).append(position)
+
+        # Plan the queries a block at a time, holding each tree until the last query that uses it or until its room is needed
+        limit = max(self.search_cache.maxsize, 2)
+        trees = {}
+        rows = {}
+        plans = [None for _ in range(len(queries))]
+        block_size = min(VECTORIZED_BLOCK_SIZE, limit // 2) if self.vectorized else 1
+        for block_start in range(0, len(order), block_size):
+            block = [(index, *queries[index]) for index in order[block_start:block_start+block_size]]
+            for _, start, destination in block:
+                for endpoint in (start, destination):
+                    if endpoint not in trees:
+                        # Release the held tree used furthest in the future, which is never one of this block as a block needs at most the limit
+                        if len(trees) >= limit:
+                            furthest = max(trees, key=lambda held: uses[held][0])
+                            del trees[furthest]
+                            rows.pop(furthest, None)
+                        trees[endpoint] = self.shortest_path_tree(endpoint)
+                        if self.vectorized:
+                            rows[endpoint] = self._pickup_row(trees[endpoint])
+
+            # Find the best pickup location of every query in the block at once if vectorized
+            if self.vectorized:
+                locations = self._best_pickups(np.stack([rows[start] for _, start, _ in block]), np.stack([rows[destination] for _, _, destination in block]))
+            else:
+                locations = [self._best_pickup(trees[start].distances, trees[destination].distances) for _, start, destination in block]
+
+            for (index, start, destination), location in zip(block, locations):
+                plans[index] = self._plan_result(start, destination, trees[start], trees[destination], location)
+                for endpoint in (start, destination):
+                    uses[endpoint].popleft()
+                    if not uses[endpoint]:
+                        del uses[endpoint]
+                        del trees[endpoint]
+                        rows.pop(endpoint, None)
+        return plans
+
+    def set_stats_hook(self, hook, sample_rate: float = 1.0) -> None:
+        """
+        Function Description: This function sets a callable which is given the PlanStats of plans, so that searches can be profiled or sampled in production
+
+        Approach Description: Each call of the plan function draws a random number and collects stats only when it is below the sample rate, so plans which are not sampled cost a single comparison more than with no hook at all. Passing None removes the hook.
+
+        Input:
+            hook: a callable taking a PlanStats, or None
+            sample_rate: a float between 0 and 1 representing the fraction of plans to collect stats for
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f'sample rate must be between 0 and 1, not {sample_rate}')
+        self.stats_hook = hook
+        self.stats_sample_rate = sample_rate
+
+    def plan_top_k(self, start: int, destination: int, k: int) -> List['PickupOption']:
+        """
+        Function Description: This function finds the k best distinct ways to pick up a friend on the way from the start to the destination
+
+        Approach Description: The shortest path trees from the start and the destination are found once, reusing trees held in the search cache, as in the plan function. Every reachable pairing of a friend and a pickup location is then scanned once while a heap of the k best seen so far is kept, ranked by time, then amount of tracks, then location, then the order of the friends at the location, so when some pickup can be reached from both the start and the destination the first option is the one the plan function returns. When none can, no options are returned, whereas the plan function still returns a plan with an infinite time. Only the first k friends at each location are looked at, as the rest cannot be among the k best. The paths are not built during the scan; each option builds its own from the two shared trees when it is first asked for.
+
+        Input:
+            start: an integer representing the starting location
+            destination: an integer representing the destination location
+            k: an integer representing the largest amount of options to return
+
+        Output: A list of at most k PickupOptions, best first, with fewer if fewer friends can be reached
+
+        Time Complexity: O(|R|log(|L|) + |L| + P·log(k)), where |R| is the number of roads, |L| is the number of locations and P is the number of pickups scanned
+
+        Auxiliary Space Complexity: O(|L| + k), for the two trees and the heap
+        """
+        start_tree = self.shortest_path_tree(start)
+        destination_tree = self.shortest_path_tree(destination)
+        start_distances, destination_distances = start_tree.distances, destination_tree.distances
+        depths = self._pickup_depths()
+
+        def candidates():
+            for location, best_depth in enumerate(depths):
+                if best_depth is None or start_distances[location] + destination_distances[location] == float('inf'):
+                    continue
+                time = start_distances[location] + destination_distances[location]
+                for order, (friend, depth) in enumerate(self.pickups[location][:k]):
+                    yield time, depth, location, order, friend
+
+        return [PickupOption(time, friend, location, depth, start_tree, destination_tree) for time, depth, location, _, friend in heapq.nsmallest(k, candidates())]
+
+    def shortest_path_tree(self, source: int, stats: Optional['SearchStats'] = None) -> 'ShortestPathTree':
+        """
+        Function Description: This function returns the shortest path tree rooted at the source, using the search cache if it holds one
+
+        Approach Description: The search cache is checked for a tree rooted at the source, if there is none the tree is found with the dijkstra function and added to the cache, evicting the least recently used tree if the cache is full
+
+        Time Complexity: O(1) on a cache hit, otherwise O(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
+        """
+        tree = self.search_cache.get(source)
+        if tree is None:
+            tree = self.dijkstra(source) if stats is None else self.dijkstra(source, stats=stats)
+            self.search_cache.put(source, tree)
+        elif stats is not None:
+            stats.cached = True
+        return tree
+
+    def _plan_with_trees(self, start: int, destination: int, start_tree: 'ShortestPathTree', destination_tree: 'ShortestPathTree') -> Tuple[int, List[int], str, int]:
+        """
+        Function Description: This function finds the best friend to pick up and the best location to pick them up from, given the shortest path trees from the start and the destination
+
+        Time Complexity: O(|L|), where |L| is the number of locations, as each location is scanned once and the path visits each location at most twice
+        """
+        location = self._find_pickup(start_tree, destination_tree)
+        return self._plan_result(start, destination, start_tree, destination_tree, location)
+
+    def _find_pickup(self, start_tree: 'ShortestPathTree', destination_tree: 'ShortestPathTree') -> Optional[int]:
+        if self.vectorized:
+            return self._best_pickups(self._pickup_row(start_tree), self._pickup_row(destination_tree))
+        return self._best_pickup(start_tree.distances, destination_tree.distances)
+
+    def _plan_result(self, start: int, destination: int, start_tree: 'ShortestPathTree', destination_tree: 'ShortestPathTree', location: Optional[int]) -> Tuple[int, List[int], str, int]:
+        # Build the plan of picking up the best friend at the location
+        if location is None:
+            return (float('inf'), None, None, None)
+        friend, _ = self.pickups[location][0]
+        return (start_tree.distances[location]+destination_tree.distances[location], self.reconstruct_path(start, location, destination, start_tree, destination_tree), friend, location)
+
+    def _best_pickup(self, start_distances: List[float], destination_distances: List[float]) -> Optional[int]:
+        """
+        Function Description: This function finds the pickup location with the shortest total time from the start to itself and itself to the destination
+
+        Time Complexity: O(|L|), where |L| is the number of locations
+        """
         # Initialise the variables
         min_time = float('inf')
-        best_friend = None
         best_distance = float('inf')
         best_pickup_location = None
 
-        # Find the distances from the start to each location and the destination to each location
-        start_distances = self.dijkstra(start)[0]
-        destination_distances = self.dijkstra(destination)[0]
-
         # Find the location with the shortest total distance from the start to itself and itself to the destination with a friend available to be picked up. If the time is the same, choose the friend with the smallest distance to travel
-        for road_index, road in enumerate(self.graph):
-            if road[1][0] is not None and (start_distances[road_index]+destination_distances[road_index] < min_time) or road[1][0] is not None and (start_distances[road_index]+destination_distances[road_index] == min_time and road[1][1] < best_distance):
-                min_time = start_distances[road_index]+destination_distances[road_index]
-                best_friend = road[1][0]
-                best_distance = road[1][1]
-                best_pickup_location = road_index
-
-        return (min_time, self.reconstruct_path(start, best_pickup_location, destination), best_friend, best_pickup_location)
-    
+        for location in range(self.locations+1):
+            pickups = self.pickups[location]
+            if not pickups:
+                continue
+            depth = pickups[0][1]
+            if start_distances[location]+destination_distances[location] < min_time or (start_distances[location]+destination_distances[location] == min_time and depth < best_distance):
+                min_time = start_distances[location]+destination_distances[location]
+                best_distance = depth
+                best_pickup_location = location
+        return best_pickup_location
+
+    def _pickup_arrays(self):
+        # The locations with a pickup and the amount of tracks of their best pickup as NumPy arrays, with a getter of the pickup locations' entries of a list, found once per propagation
+        if self.pickup_arrays is None:
+            locations = [location for location in range(self.locations+1) if self.pickups[location]]
+            getter = itemgetter(*locations) if locations else (lambda distances: ())
+            self.pickup_arrays = (np.array(locations, dtype=np.int64), np.array([self.pickups[location][0][1] for location in locations], dtype=np.int64), getter)
+        return self.pickup_arrays
+
+    def _pickup_row(self, tree: 'ShortestPathTree'):
+        # The times from the root of the tree to each pickup location as a NumPy array, only converting the pickup locations' entries rather than the whole list
+        return np.array(self._pickup_arrays()[2](tree.distances), dtype=np.float64, ndmin=1)
+
+    def _best_pickups(self, start_rows, destination_rows):
+        """
+        Function Description: This function finds the best pickup location for one (start, destination) pair, or for a batch of them at once
+
+        Approach Description: The rows hold the times from each start and each destination to every pickup location, as vectors for one pair or as matrices with one row per pair. Their sum is the total time of every pickup. The shortest total of each row is found, every pickup that does not reach it is masked out, and the first of the remaining pickups with the fewest tracks is taken, which is the same location the scan in _best_pickup finds. If no pickup can be reached from both ends every total is infinite, so, as in _best_pickup, the first pickup with the fewest tracks is taken, and None is only returned when there are no pickup locations at all.
+
+        Time Complexity: O(Q·P) NumPy operations, where Q is the amount of pairs and P is the amount of pickup locations
+        """
+        locations, depths, _ = self._pickup_arrays()
+        single = start_rows.ndim == 1
+        totals = np.atleast_2d(start_rows + destination_rows)
+        if totals.shape[1] == 0:
+            return None if single else [None for _ in range(totals.shape[0])]
+        shortest = totals.min(axis=1, keepdims=True)
+        best = np.where(totals == shortest, depths, np.iinfo(np.int64).max).argmin(axis=1)
+        best_locations = [int(locations[i]) for i in best]
+        return best_locations[0] if single else best_locations
+
+    def update_road_time(self, u: int, v: int, time: int) -> None:
+        """
+        Function Description: This function changes the time of every road between u and v, repairing the cached shortest path trees
+
+        Approach Description: On a compact city the weights are changed in place where the new time fits the weights array, otherwise the roads at u and v are rewritten. See _roads_changed for how the cached trees are repaired.
+
+        Input:
+            u: an integer representing one end of the road
+            v: an integer representing the other end of the road
+            time: an integer representing the new time of the road
+
+        Time Complexity: O(deg(u) + deg(v)) to change the road plus the repair of the cached trees, where deg is the amount of roads at a location
+        """
+        if not self._has_road(u, v):
+            raise ValueError(f'There is no road between {u} and {v}')
+        if self.compact and (isinstance(time, int) or memoryview(self.roads.weights).format == 'd'):
+            self.roads.update_weight(u, v, time)
+        else:
+            self._edit_roads(u, v, lambda edges, other: [(x, time if x == other else m) for x, m in edges])
+        self._roads_changed(u, v, time)
+
+    def add_road(self, u: int, v: int, time: int) -> None:
+        """
+        Function Description: This function adds a road between u and v, adding any new locations and repairing the cached shortest path trees
+
+        Input:
+            u: an integer representing one end of the road
+            v: an integer representing the other end of the road
+            time: an integer representing the time of the road
+
+        Time Complexity: O(1) amortised on an adjacency list and O(|R| + |L|) on a compact city to add the road, plus the repair of the cached trees
+        """
+        if max(u, v) > self.locations:
+            self._add_locations(max(u, v))
+        self._edit_roads(u, v, lambda edges, other: edges + [(other, time)])
+        self._roads_changed(u, v, time)
+
+    def remove_road(self, u: int, v: int) -> None:
+        """
+        Function Description: This function removes every road between u and v, repairing the cached shortest path trees
+
+        Input:
+            u: an integer representing one end of the road
+            v: an integer representing the other end of the road
+
+        Time Complexity: O(deg(u) + deg(v)) on an adjacency list and O(|R| + |L|) on a compact city to remove the road, plus the repair of the cached trees
+        """
+        if not self._has_road(u, v):
+            raise ValueError(f'There is no road between {u} and {v}')
+        self._edit_roads(u, v, lambda edges, other: [(x, m) for x, m in edges if x != other])
+        self._roads_changed(u, v, None)
+
+    def move_friend(self, friend: str, location: int) -> None:
+        """
+        Function Description: This function moves a friend to a new home location and finds the locations they can now be picked up from, adding the location to the city if it is new
+
+        Time Complexity: O(|L| + |F| + |T|), where |L| is the number of locations, |F| is the number of friends and |T| is the number of tracks, as the pickups are propagated again
+        """
+        if self.friends is None:
+            raise ValueError('The friends of this city are unknown, so its pickups cannot be propagated again')
+        if friend not in (name for name, _ in self.friends):
+            raise ValueError(f'There is no friend called {friend!r}')
+        self._propagate_changed((location,), self.tracks, [(name, location if name == friend else home) for name, home in self.friends])
+
+    def add_track(self, u: int, v: int, time: int = 0) -> None:
+        """
+        Function Description: This function adds a track from u to v and finds the locations friends can now be picked up from, adding u and v to the city if they are new
+
+        Time Complexity: O(|L| + |F| + |T|), where |L| is the number of locations, |F| is the number of friends and |T| is the number of tracks, as the pickups are propagated again
+        """
+        if self.tracks is None:
+            raise ValueError('The tracks of this city are unknown, so its pickups cannot be propagated again')
+        self._propagate_changed((u, v), self.tracks + [(u, v, time)], self.friends)
+
+    def _propagate_changed(self, locations: Tuple[int, ...], tracks: Optional[List[Tuple[int, int, int]]], friends: Optional[List[Tuple[str, int]]]) -> None:
+        # Propagate the pickups from the changed tracks or friends, adding any new locations as a road to them would, and keeping the old tracks and friends if propagation fails
+        for location in locations:
+            if not isinstance(location, int) or location < 0:
+                raise ValueError(f'{location!r} is not a location')
+        if max(locations) > self.locations:
+            self._add_locations(max(locations))
+        old_tracks, old_friends = self.tracks, self.friends
+        self.tracks, self.friends = tracks, friends
+        try:
+            self._propagate_pickups()
+        except BaseException:
+            self.tracks, self.friends = old_tracks, old_friends
+            raise
+
+    def _has_road(self, u: int, v: int) -> bool:
+        return max(u, v) <= self.locations and any(x == v for x, _ in self.roads[u])
+
+    def _edit_roads(self, u: int, v: int, edit) -> None:
+        # Replace the roads at u and at v with the edited roads, rebuilding the arrays of a compact city
+        roads = [list(self.roads[location]) for location in range(self.locations+1)] if self.compact else self.roads
+        roads[u] = edit(roads[u], v)
+        roads[v] = edit(roads[v], u)
+        if self.compact:
+            self.roads = CSRGraph.from_adjacency(roads)
+
+    def _add_locations(self, location: int) -> None:
+        # Grow the roads, pickups and cached trees so the location exists, new locations have no roads or pickups
+        added = location - self.locations
+        self.locations = location
+        self.pickup_index = None
+        self.pickup_arrays = None
+        self.pickup_depths = None
+        if self.compact:
+            self.roads = CSRGraph.from_adjacency([list(self.roads[x]) for x in range(len(self.roads))] + [[] for _ in range(added)])
+            pickups = self.pickups
+            self.pickups = PickupTable(array('q', pickups.offsets) + array('q', [pickups.offsets[-1]]) * added, pickups.friend_ids, pickups.depths, pickups.friend_names)
+        else:
+            self.roads.extend([] for _ in range(added))
+            self.pickups.extend(() for _ in range(added))
+        for tree in self.search_cache.trees.values():
+            tree.distances.extend(float('inf') for _ in range(added))
+            tree.previous.extend(None for _ in range(added))
+
+    def _roads_changed(self, u: int, v: int, time: Optional[int]) -> None:
+        """
+        Function Description: This function keeps the city consistent after the roads between u and v change, repairing each cached shortest path tree instead of discarding it
+
+        Approach Description: The priority queue is switched away from the bucket queue if the new time no longer fits it. The contraction hierarchy, landmarks and pickup index depend on every road time, so they are dropped and have to be built again. Each cached tree is then repaired in the style of Ramalingam and Reps: if the road was the tree road into u or v and the shortest time between them grew, the subtree below it is the only part whose distances can grow, so those locations are reset and seeded from their neighbours outside the subtree. If the shortest time between them fell, the end it now improves is seeded instead. Dijkstra's algorithm is then run from the seeded locations only, settling just the locations whose distance actually changes.
+
+        Time Complexity: O(A·d·log(A·d)) per cached tree, where A is the number of locations whose distance changes and d is their amount of roads
+        """
+        if time is not None and time > self.max_road_time:
+            self.max_road_time = time
+        if self.queue == 'bucket' and time is not None and (not isinstance(time, int) or self.max_road_time > BUCKET_QUEUE_LIMIT):
+            self.queue = 'indexed'
+        self.hierarchy = None
+        self.landmarks = None
+        self.pickup_index = None
+
+        shortest = min((m for x, m in self.roads[u] if x == v), default=float('inf'))
+        for tree in self.search_cache.trees.values():
+            distances = tree.distances
+            previous = tree.previous
+            min_heap = MinHeap(1)
+
+            # Reset the subtree below the road if the road into it got longer or was removed
+            affected = set()
+            for a, b in ((u, v), (v, u)):
+                if previous[b] == a and distances[a] + shortest > distances[b]:
+                    affected.add(b)
+                    stack = [b]
+                    while stack:
+                        location = stack.pop()
+                        for neighbor, _ in self.roads[location]:
+                            if previous[neighbor] == location and neighbor not in affected:
+                                affected.add(neighbor)
+                                stack.append(neighbor)
+            for location in affected:
+                distances[location] = float('inf')
+                previous[location] = None
+            for location in affected:
+                for neighbor, weight in self.roads[location]:
+                    if neighbor not in affected and distances[neighbor] + weight < distances[location]:
+                        distances[location] = distances[neighbor] + weight
+                        previous[location] = neighbor
+                if distances[location] < float('inf'):
+                    min_heap.add((distances[location], location))
+
+            # Seed either end of the road if it got shorter or was added
+            for a, b in ((u, v), (v, u)):
+                if distances[a] + shortest < distances[b]:
+                    distances[b] = distances[a] + shortest
+                    previous[b] = a
+                    min_heap.add((distances[b], b))
+
+            # Dijkstra's algorithm from the seeded locations
+            while min_heap:
+                current_dist, current_loc = min_heap.get_min()
+                if current_dist > distances[current_loc]:
+                    continue
+                for neighbor, weight in self.roads[current_loc]:
+                    distance = current_dist + weight
+                    if distance < distances[neighbor]:
+                        distances[neighbor] = distance
+                        previous[neighbor] = current_loc
+                        min_heap.add((distance, neighbor))
+
+
+class ShortestPathTree:
+    """
+    The distances and previous locations found by a single source search, from which the path to any location can be extracted lazily
+    """
+
+    def __init__(self, source: int, distances: List[float], previous: List[Optional[int]]) -> None:
+        self.source = source
+        self.distances = distances
+        self.previous = previous
+
+    def distance(self, target: int) -> float:
+        return self.distances[target]
+
+    def path_to(self, target: int) -> List[int]:
+        """
+        Function Description: This function extracts the path from the source of the tree to the target
+
+        Approach Description: The previous locations are followed back from the target until the source is reached, the path is then reversed
+
+        Time Complexity: O(|L|), where |L| is the number of locations, as a path visits each location at most once
+        """
+        path = []
+        while target is not None:
+            path.append(target)
+            target = self.previous[target]
+        return path[::-1]
+
+    def path_from(self, target: int) -> List[int]:
+        """
+        Function Description: This function extracts the path from the target to the source of the tree
+
+        Approach Description: As roads are undirected the path from the target to the source is the path from the source to the target in reverse, so the previous locations are followed back from the target without reversing
+
+        Time Complexity: O(|L|), where |L| is the number of locations, as a path visits each location at most once
+        """
+        path = []
+        while target is not None:
+            path.append(target)
+            target = self.previous[target]
+        return path
+
+class PickupOption:
+    """
+    One way to pick up a friend found by plan_top_k, whose path is built from the shared shortest path trees only when it is first asked for
+    """
+
+    def __init__(self, time: float, friend: str, location: int, depth: int, start_tree: 'ShortestPathTree', destination_tree: 'ShortestPathTree') -> None:
+        self.time = time
+        self.friend = friend
+        self.location = location
+        self.depth = depth
+        self.start_tree = start_tree
+        self.destination_tree = destination_tree
+        self._path = None
+
+    @property
+    def path(self) -> List[int]:
+        # The path from the start to the destination via the pickup location, as in CityMap.reconstruct_path
+        if self._path is None:
+            self._path = self.start_tree.path_to(self.location)[:-1] + self.destination_tree.path_from(self.location)
+        return self._path
+
+    def as_plan(self) -> Tuple[int, List[int], str, int]:
+        # The option as the tuple the plan function returns
+        return self.time, self.path, self.friend, self.location
+
+    def __repr__(self) -> str:
+        return f'PickupOption(time={self.time!r}, friend={self.friend!r}, location={self.location!r}, depth={self.depth!r})'
+
+
+class SearchStats:
+    """
+    The counters of a single search, filled in by the dijkstra function when it is given one
+    """
+
+    def __init__(self) -> None:
+        self.settled = 0
+        self.stale = 0
+        self.relaxed = 0
+        self.cached = False
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {'settled': self.settled, 'stale': self.stale, 'relaxed': self.relaxed, 'cached': self.cached, 'seconds': self.seconds}
+
+
+class PlanStats:
+    """
+    The counters of both searches of a single plan and the time spent in each phase of it, filled in by the plan function when it is given one or when the city has a stats hook
+    """
+
+    def __init__(self) -> None:
+        self.start_search = SearchStats()
+        self.destination_search = SearchStats()
+        self.timings = {}
+
+    def as_dict(self) -> dict:
+        return {'start_search': self.start_search.as_dict(), 'destination_search': self.destination_search.as_dict(), 'timings': dict(self.timings)}
+
+
+class DistanceMatrix:
+    """
+    The times between each source and each target found by CityMap.distance_matrix, held row by row in flat arrays of doubles
+    """
+
+    def __init__(self, sources: List[int], targets: List[int], times: array, pickup_times: Optional[array] = None) -> None:
+        self.sources = sources
+        self.targets = targets
+        self.times = times
+        self.pickup_times = pickup_times
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.sources), len(self.targets)
+
+    def __getitem__(self, index: Tuple[int, int]) -> float:
+        row, column = index
+        return self.times[self._position(row, column)]
+
+    def pickup_time(self, row: int, column: int) -> float:
+        return self._table(True)[self._position(row, column)]
+
+    def tolist(self, pickups: bool = False) -> List[List[float]]:
+        times = self._table(pickups)
+        return [times[row*len(self.targets):(row+1)*len(self.targets)].tolist() for row in range(len(self.sources))]
+
+    def to_numpy(self, pickups: bool = False):
+        # A view of the matrix as a 2-D NumPy array, sharing the memory of the flat array
+        if np is None:
+            raise ImportError('to_numpy requires NumPy')
+        return np.frombuffer(self._table(pickups), dtype=np.float64).reshape(self.shape)
+
+    def _position(self, row: int, column: int) -> int:
+        # The position of an entry in the flat arrays, checked so a column past the end cannot read the next row
+        if not 0 <= row < len(self.sources) or not 0 <= column < len(self.targets):
+            raise IndexError(f'({row}, {column}) is outside a matrix of shape {self.shape}')
+        return row*len(self.targets)+column
+
+    def _table(self, pickups: bool) -> array:
+        if not pickups:
+            return self.times
+        if self.pickup_times is None:
+            raise ValueError('the matrix was found without pickups')
+        return self.pickup_times
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class SearchCache:
+    """
+    A size bounded least recently used cache of shortest path trees keyed by their source location, with hit and miss statistics
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.trees)
+
+    def get(self, source: int) -> Optional[ShortestPathTree]:
+        tree = self.trees.get(source)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.trees.move_to_end(source)
+        return tree
+
+    def put(self, source: int, tree: ShortestPathTree) -> None:
+        if self.maxsize <= 0:
+            return
+        self.trees[source] = tree
+        self.trees.move_to_end(source)
+        if len(self.trees) > self.maxsize:
+            self.trees.popitem(last=False)
+
+    def clear(self) -> None:
+        self.trees.clear()
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self.trees))
+
+
+class SearchWorkspace:
+    """
+    The distances, previous locations, settled flags and priority queue of a search, kept between searches on one thread. Each entry is stamped with the generation of the search which wrote it, so starting a search only increments the generation instead of resetting every location.
+    """
+
+    def __init__(self, size: int, queue) -> None:
+        self.generation = 0
+        self.stamps = [0 for _ in range(size)]
+        self.settled = [0 for _ in range(size)]
+        self.distances = [float('inf') for _ in range(size)]
+        self.previous = [None for _ in range(size)]
+        self.queue = queue
+
+    def start(self, source: int) -> int:
+        # Begin a new search from the source, returning its generation
+        self.generation += 1
+        self.queue.clear()
+        self.stamps[source] = self.generation
+        self.distances[source] = 0
+        self.previous[source] = None
+        self.queue.push(0, source)
+        return self.generation
+
+    def distance(self, location: int) -> float:
+        return self.distances[location] if self.stamps[location] == self.generation else float('inf')
+
+    def path_to(self, target: int) -> List[int]:
+        # The path from the source to a location reached by the current search
+        path = []
+        while target is not None:
+            path.append(target)
+            target = self.previous[target] if self.stamps[target] == self.generation else None
+        return path[::-1]
+
+
+class CSRGraph:
+    """
+    The roads of the city stored in compressed sparse row form, the roads leaving location u are targets[offsets[u]:offsets[u+1]] with the matching weights
+    """
+
+    def __init__(self, offsets, targets, weights) -> None:
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_edges(cls, size: int, sources: array, targets: array, weights: array) -> 'CSRGraph':
+        """
+        Function Description: This function builds the offsets, targets and weights arrays from arrays of the ends and times of each road
+
+        Approach Description: The degree of each location is counted and turned into offsets with a prefix sum. Each road is then written at both of its ends, in the same order the adjacency list would have appended them, so searches break ties identically on both representations.
+
+        Time Complexity: O(|R| + |L|), where |R| is the number of roads and |L| is the number of locations
+
+        Auxiliary Space Complexity: O(|R| + |L|), as three machine words are stored per road end and one per location
+        """
+        # Count the roads at each location
+        offsets = array('q', bytes(8*(size+1)))
+        for u, v in zip(sources, targets):
+            offsets[u+1] += 1
+            offsets[v+1] += 1
+        for location in range(size):
+            offsets[location+1] += offsets[location]
+
+        # Write each road at both of its ends
+        cursor = array('q', offsets)
+        road_targets = array('q', bytes(8*offsets[size]))
+        road_weights = array(weights.typecode, bytes(8*offsets[size]))
+        for u, v, m in zip(sources, targets, weights):
+            road_targets[cursor[u]] = v
+            road_weights[cursor[u]] = m
+            cursor[u] += 1
+            road_targets[cursor[v]] = u
+            road_weights[cursor[v]] = m
+            cursor[v] += 1
+        return cls(offsets, road_targets, road_weights)
+
+    @classmethod
+    def from_adjacency(cls, roads: List[List[Tuple[int, int]]]) -> 'CSRGraph':
+        """
+        Function Description: This function builds the compact arrays from an adjacency list of roads, keeping the order of the roads at each location
+
+        Time Complexity: O(|R| + |L|), where |R| is the number of roads and |L| is the number of locations
+        """
+        offsets = array('q', [0])
+        targets = array('q')
+        weights = array('q' if all(isinstance(m, int) for edges in roads for _, m in edges) else 'd')
+        for edges in roads:
+            for v, m in edges:
+                targets.append(v)
+                weights.append(m)
+            offsets.append(len(targets))
+        return cls(offsets, targets, weights)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, location: int) -> Iterator[Tuple[int, int]]:
+        start, end = self.offsets[location], self.offsets[location+1]
+        return zip(self.targets[start:end], self.weights[start:end])
+
+    def degree(self, location: int) -> int:
+        return self.offsets[location+1] - self.offsets[location]
+
+    def update_weight(self, u: int, v: int, weight) -> None:
+        # Change the weight of every road between u and v in place
+        for a, b in ((u, v), (v, u)):
+            for i in range(self.offsets[a], self.offsets[a+1]):
+                if self.targets[i] == b:
+                    self.weights[i] = weight
+
+
+class PickupTable:
+    """
+    The friends that can be picked up at each location and the amount of tracks used to get there, stored in compressed sparse row form, the pickups at location u are friend_ids[offsets[u]:offsets[u+1]] with the matching depths, ordered by depth
+    """
+
+    def __init__(self, offsets, friend_ids, depths, friend_names: List[str]) -> None:
+        self.offsets = offsets
+        self.friend_ids = friend_ids
+        self.depths = depths
+        self.friend_names = list(friend_names)
+
+    @classmethod
+    def from_ids(cls, size: int, pickups: dict, friend_names: List[str]) -> 'PickupTable':
+        # Build the arrays from the ordered (friend id, depth) pairs of each location that has any
+        offsets = array('q', [0])
+        friend_ids = array('q')
+        depths = array('q')
+        for location in range(size):
+            for friend_id, depth in pickups.get(location, ()):
+                friend_ids.append(friend_id)
+                depths.append(depth)
+            offsets.append(len(friend_ids))
+        return cls(offsets, friend_ids, depths, friend_names)
+
+    @classmethod
+    def from_list(cls, pickups: List[Tuple[Tuple[str, int], ...]]) -> 'PickupTable':
+        # Build the arrays from a pickup list, numbering the friends in the order they first appear
+        name_ids = {}
+        for location_pickups in pickups:
+            for friend, _ in location_pickups:
+                name_ids.setdefault(friend, len(name_ids))
+        ids = {location: [(name_ids[friend], depth) for friend, depth in location_pickups] for location, location_pickups in enumerate(pickups)}
+        return cls.from_ids(len(pickups), ids, list(name_ids))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, location: int) -> Tuple[Tuple[str, int], ...]:
+        start, end = self.offsets[location], self.offsets[location+1]
+        return tuple((self.friend_names[friend_id], depth) for friend_id, depth in zip(self.friend_ids[start:end], self.depths[start:end]))
+
+
+class Landmarks:
+    """
+    The time from each landmark to every location, giving lower bounds on the time between any two locations by the triangle inequality
+    """
+
+    def __init__(self, locations: List[int], tables: List[array]) -> None:
+        self.locations = locations
+        self.tables = tables
+
+    def lower_bound_to(self, destination: int):
+        """
+        Function Description: This function returns a function giving a lower bound on the time from any location to the destination
+
+        Approach Description: As roads are undirected, for each landmark l the time from v to t is at least |d(l, t) - d(l, v)|, so the largest of these over all landmarks is used. Landmarks which cannot reach v or t give no bound and are skipped. The times from each landmark to the destination are looked up once and the bound of each location is remembered, as A* asks for it every time the location is relaxed.
+
+        Time Complexity: O(k) per new location, where k is the amount of landmarks
+        """
+        to_destination = [(table[destination], table) for table in self.tables]
+        bounds = {}
+
+        def bound(location: int) -> float:
+            if location not in bounds:
+                bounds[location] = max((abs(distance - table[location]) for distance, table in to_destination if distance != float('inf') and table[location] != float('inf')), default=0)
+            return bounds[location]
+        return bound
+
+
+class PickupIndex:
+    """
+    The nearest pickup location to every location, with the time to it and the amount of tracks of its best pickup, found by one Dijkstra search from every pickup location at once
+    """
+
+    def __init__(self, roads, depths: List[Optional[int]]) -> None:
+        """
+        Function Description: This initialisation finds the nearest pickup location to every location
+
+        Approach Description: Every pickup location is put in the min heap at once, and Dijkstra's algorithm labels each location with the time, amount of tracks and location of the pickup it is nearest to. Labels are compared as tuples, so of two pickups equally far away the one with fewer tracks and then the lower location wins, which is the order the plan function breaks ties in. As roads are undirected the time from a location to its label's pickup is also the time back.
+
+        Input:
+            roads: the road graph, an adjacency list or CSRGraph
+            depths: the amount of tracks of the best pickup at each location, or None where there is none
+
+        Time Complexity: O(|R|log(|L|)), where |R| is the number of roads and |L| is the number of locations
+        """
+        self.roads = roads
+        self.sources = list(depths)
+        self.distances = [float('inf') for _ in depths]
+        self.depths = [-1 for _ in depths]
+        self.nearest = [-1 for _ in depths]
+        min_heap = MinHeap(1)
+        for location, depth in enumerate(depths):
+            if depth is not None:
+                self._seed(min_heap, location, (0, depth, location))
+        self._search(min_heap)
+
+    def _label(self, location: int) -> Tuple[float, int, int]:
+        return self.distances[location], self.depths[location], self.nearest[location]
+
+    def _seed(self, min_heap: 'MinHeap', location: int, label: Tuple[float, int, int]) -> None:
+        if label < self._label(location):
+            self.distances[location], self.depths[location], self.nearest[location] = label
+            min_heap.add((label, location))
+
+    def _search(self, min_heap: 'MinHeap') -> None:
+        # Dijkstra's algorithm over labels, settling each location with the smallest label offered to it
+        while min_heap:
+            label, current_loc = min_heap.get_min()
+            if label > self._label(current_loc):
+                continue
+            distance, depth, pickup = label
+            for neighbor, weight in self.roads[current_loc]:
+                self._seed(min_heap, neighbor, (distance + weight, depth, pickup))
+
+    def update(self, depths: List[Optional[int]]) -> None:
+        """
+        Function Description: This function brings the index up to date after the pickups change, such as when a friend moves or a track is added
+
+        Approach Description: Only the pickup locations whose amount of tracks changed, or which gained or lost their pickups, are looked at. The locations labelled with one of them form a connected region around it, as each label was passed along roads between locations with the same label, so each region is found by a search from its pickup location and its labels are cleared. The cleared locations are then offered the labels of their neighbours outside the regions, the cleared and changed locations which have pickups are offered their own labels, and Dijkstra's algorithm is run from only these, so the labels of every other location are kept.
+
+        Input:
+            depths: the amount of tracks of the best pickup at each location, or None where there is none
+
+        Time Complexity: O(A·d·log(A·d)), where A is the number of locations whose nearest pickup was or becomes a changed pickup location and d is their amount of roads
+        """
+        changed = [location for location, (old, new) in enumerate(zip(self.sources, depths)) if old != new]
+        self.sources = list(depths)
+
+        # Clear the labels of every location labelled with a changed pickup location
+        cleared = []
+        for pickup in changed:
+            if self.nearest[pickup] != pickup:
+                continue
+            stack = [pickup]
+            self.distances[pickup], self.depths[pickup], self.nearest[pickup] = float('inf'), -1, -1
+            while stack:
+                location = stack.pop()
+                cleared.append(location)
+                for neighbor, _ in self.roads[location]:
+                    if self.nearest[neighbor] == pickup:
+                        self.distances[neighbor], self.depths[neighbor], self.nearest[neighbor] = float('inf'), -1, -1
+                        stack.append(neighbor)
+
+        # Offer the cleared locations the labels of their neighbours, and the cleared or changed pickup locations their own, as a pickup location can be labelled with another pickup location as near with fewer tracks, then search from them
+        min_heap = MinHeap(1)
+        for location in cleared:
+            for neighbor, weight in self.roads[location]:
+                if self.nearest[neighbor] != -1:
+                    distance, depth, pickup = self._label(neighbor)
+                    self._seed(min_heap, location, (distance + weight, depth, pickup))
+        for pickup in cleared + changed:
+            if depths[pickup] is not None:
+                self._seed(min_heap, pickup, (0, depths[pickup], pickup))
+        self._search(min_heap)
+
+    def nearest_pickup(self, location: int) -> Tuple[float, Optional[int], Optional[int]]:
+        # The time to the nearest pickup location, the location and the amount of tracks of its best pickup
+        if self.nearest[location] == -1:
+            return float('inf'), None, None
+        return self.distances[location], self.nearest[location], self.depths[location]
+
+
+class ContractionHierarchy:
+    """
+    A contraction hierarchy over the undirected roads, answering point to point queries with a bidirectional search that only follows roads and shortcuts towards more important locations
+    """
+
+    def __init__(self, roads, witness_limit: int = 64) -> None:
+        """
+        Function Description: This initialisation contracts every location in order of importance, adding shortcuts that preserve shortest paths between the remaining locations
+
+        Approach Description: The least important remaining location is found with a min heap keyed on its priority: twice its edge difference, the amount of shortcuts contracting it would add minus its amount of roads, plus the amount of its neighbours already contracted so contraction spreads evenly, plus its level, one more than the highest level of its contracted neighbours, so the hierarchy stays shallow. The shortcuts of each location are kept, and are found again with its priority only when it reaches the top of the heap after one of its neighbours was contracted, as until then its roads are unchanged. They are also found again just before the location is contracted, as a witness found earlier may have run through a location contracted since. Contracting a location adds a shortcut between each pair of its remaining neighbours unless a bounded witness search finds a path at least as short that avoids it. The roads and shortcuts from each location to more important locations are then kept as the upward graph in compressed sparse row arrays, with the contracted location each shortcut skips so paths can be unpacked.
+
+        Input:
+            roads: the roads of a CityMap, either an adjacency list or a CSRGraph
+            witness_limit: an integer representing the amount of locations each witness search may settle
+
+        Time Complexity: O(|L|·d²·w·log(w)) in practice, where |L| is the number of locations, d is the degree of a location when it is contracted and w is the witness limit
+
+        Auxiliary Space Complexity: O(|R| + |S|), where |R| is the number of roads and |S| is the number of shortcuts added
+        """
+        size = len(roads)
+        self.witness_limit = witness_limit
+
+        # Keep the shortest road between each pair of locations, skipping roads from a location to itself
+        graph = [{} for _ in range(size)]
+        for u in range(size):
+            for v, m in roads[u]:
+                if v != u and m < graph[u].get(v, float('inf')):
+                    graph[u][v] = m
+        middles = {}
+        contracted_neighbours = [0 for _ in range(size)]
+        levels = [0 for _ in range(size)]
+        upward = [None for _ in range(size)]
+        self.rank = array('q', bytes(8*size))
+
+        # Find the shortcuts each location would add and order the locations by their priority
+        shortcuts = [self._shortcuts(graph, location) for location in range(size)]
+        min_heap = MinHeap(size)
+        for location in range(size):
+            min_heap.add((self._priority(graph, shortcuts[location], location, contracted_neighbours, levels), location))
+
+        # Contract the least important location
+        rank = 0
+        while min_heap:
+            _, location = min_heap.get_min()
+            if shortcuts[location] is None:
+                # A neighbour has been contracted since its shortcuts were found, so its priority is found again and it waits if it is no longer the least important
+                shortcuts[location] = self._shortcuts(graph, location)
+                priority = self._priority(graph, shortcuts[location], location, contracted_neighbours, levels)
+                if min_heap and priority > min_heap.array[1][0]:
+                    min_heap.add((priority, location))
+                    continue
+            elif rank > 0:
+                # Witnesses found before may have run through locations contracted since, so the shortcuts are found again for the contraction itself
+                shortcuts[location] = self._shortcuts(graph, location)
+
+            self.rank[location] = rank
+            rank += 1
+            upward[location] = [(neighbour, m, middles.get((min(location, neighbour), max(location, neighbour)), -1)) for neighbour, m in graph[location].items()]
+            for u, v, m in shortcuts[location]:
+                if m < graph[u].get(v, float('inf')):
+                    graph[u][v] = m
+                    graph[v][u] = m
+                    middles[(min(u, v), max(u, v))] = location
+            for neighbour in graph[location]:
+                del graph[neighbour][location]
+                contracted_neighbours[neighbour] += 1
+                levels[neighbour] = max(levels[neighbour], levels[location] + 1)
+                shortcuts[neighbour] = None
+            graph[location] = {}
+            shortcuts[location] = None
+
+        # Store the upward graph in compressed sparse row arrays
+        self.offsets = array('q', [0])
+        self.targets = array('q')
+        self.weights = array('q' if all(isinstance(m, int) for edges in upward for _, m, _ in edges) else 'd')
+        self.middles = array('q')
+        for edges in upward:
+            for v, m, middle in edges:
+                self.targets.append(v)
+                self.weights.append(m)
+                self.middles.append(middle)
+            self.offsets.append(len(self.targets))
+
+    @classmethod
+    def from_arrays(cls, rank, offsets, targets, weights, middles, witness_limit: int = 64) -> 'ContractionHierarchy':
+        hierarchy = cls.__new__(cls)
+        hierarchy.rank = rank
+        hierarchy.offsets = offsets
+        hierarchy.targets = targets
+        hierarchy.weights = weights
+        hierarchy.middles = middles
+        hierarchy.witness_limit = witness_limit
+        return hierarchy
+
+    def _witness_search(self, graph: List[dict], source: int, avoid: int, targets: dict) -> dict:
+        # Dijkstra's algorithm from the source avoiding one location, stopping after the witness limit or once no target left unsettled could still be reached in less time than through the avoided location
+        remaining = dict(targets)
+        limit = max(remaining.values())
+        distances = {source: 0}
+        min_heap = [(0, source)]
+        settled = 0
+        while min_heap and settled < self.witness_limit:
+            current_dist, current_loc = heapq.heappop(min_heap)
+            if current_dist > distances[current_loc]:
+                continue
+            if current_dist > limit:
+                break
+            settled += 1
+            if current_loc in remaining:
+                del remaining[current_loc]
+                if not remaining:
+                    break
+                limit = max(remaining.values())
+            for neighbour, m in graph[current_loc].items():
+                distance = current_dist + m
+                if neighbour != avoid and distance < distances.get(neighbour, float('inf')):
+                    distances[neighbour] = distance
+                    heapq.heappush(min_heap, (distance, neighbour))
+        return distances
+
+    def _shortcuts(self, graph: List[dict], location: int) -> List[Tuple[int, int, int]]:
+        # Find the shortcuts needed between the remaining neighbours of the location if it were contracted
+        neighbours = list(graph[location].items())
+        shortcuts = []
+        for i, (u, to_u) in enumerate(neighbours[:-1]):
+            through = {v: to_u + to_v for v, to_v in neighbours[i+1:]}
+            witnesses = self._witness_search(graph, u, location, through)
+            for v, time in through.items():
+                if witnesses.get(v, float('inf')) > time:
+                    shortcuts.append((u, v, time))
+        return shortcuts
+
+    def _priority(self, graph: List[dict], shortcuts: list, location: int, contracted_neighbours: List[int], levels: List[int]) -> int:
+        # The edge difference of the location, plus its amount of contracted neighbours to spread contraction evenly and its level to keep the hierarchy shallow
+        return 2*(len(shortcuts) - len(graph[location])) + contracted_neighbours[location] + levels[location]
+
+    def _upward_search(self, start: int, destination: int) -> Tuple[float, Optional[int], List[dict]]:
+        # The upward search spaces of the start and the destination, which meet at the most important location on the shortest path between them
+        previous = [{start: None}, {destination: None}]
+        forward = self._upward_space(start, previous[0])
+        backward = self._upward_space(destination, previous[1], forward)
+        best, meeting = min(((distance + forward[location], location) for location, distance in backward.items() if location in forward), default=(float('inf'), None))
+        return best, meeting, previous
+
+    def _upward_space(self, source: int, previous: Optional[dict] = None, other: Optional[dict] = None) -> dict:
+        """
+        Function Description: This function finds the times from the source to the locations of its upward search space, the locations reached by following roads and shortcuts towards more important locations only
+
+        Approach Description: Dijkstra's algorithm over the upward graph, which is small as it only moves towards more important locations. With stall on demand, a location reached in more time than through one of the more important locations already reached is on no shortest path, so it is left out and its roads are not followed. If the upward search space from the other end of a query is given, the search stops once its smallest distance is no less than the best time found through a location both reach.
+
+        Input:
+            source: an integer representing the location to search from
+            previous: an optional dictionary which is filled in with the previous location of each location reached
+            other: an optional dictionary of the upward search space from the other end of a query
+
+        Output: A dictionary of the times to each location settled and not stalled
+        """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        distances = {source: 0}
+        space = {}
+        best = float('inf')
+        min_heap = [(0, source)]
+        while min_heap:
+            current_dist, current_loc = heapq.heappop(min_heap)
+            if current_dist >= best:
+                break
+            if current_dist > distances[current_loc]:
+                continue
+            roads = list(zip(targets[offsets[current_loc]:offsets[current_loc+1]], weights[offsets[current_loc]:offsets[current_loc+1]]))
+            if any(distances.get(neighbour, float('inf')) + m < current_dist for neighbour, m in roads):
+                continue
+            space[current_loc] = current_dist
+            if other is not None and current_loc in other:
+                best = min(best, current_dist + other[current_loc])
+            for neighbour, m in roads:
+                distance = current_dist + m
+                if distance < distances.get(neighbour, float('inf')):
+                    distances[neighbour] = distance
+                    if previous is not None:
+                        previous[neighbour] = current_loc
+                    heapq.heappush(min_heap, (distance, neighbour))
+        return space
+
+    def distance_table(self, sources: List[int], targets: List[int]) -> array:
+        """
+        Function Description: This function finds the shortest time between each source and each target, returned row by row in one flat array
+
+        Approach Description: The bucket based many to many search. The upward search space of each target is found once, and the time from each location in it to the target is left in a bucket at that location. The upward search space of each source is then found, and the buckets at each location it reaches are scanned, as the shortest path between any source and target meets at the most important location on it, which both upward searches reach with their exact times.
+
+        Time Complexity: O((|S| + |T|)·U·log(U) + B), where |S| and |T| are the number of sources and targets, U is the size of an upward search space and B is the number of bucket entries scanned
+        """
+        buckets = {}
+        for column, target in enumerate(targets):
+            for location, distance in self._upward_space(target).items():
+                buckets.setdefault(location, ([], []))
+                buckets[location][0].append(column)
+                buckets[location][1].append(distance)
+
+        # With NumPy each bucket is scanned in one operation, as a bucket holds each target at most once
+        times = array('d')
+        if np is not None:
+            buckets = {location: (np.array(columns, dtype=np.int64), np.array(distances, dtype=np.float64)) for location, (columns, distances) in buckets.items()}
+            for source in sources:
+                row = np.full(len(targets), float('inf'))
+                for location, distance in self._upward_space(source).items():
+                    if location in buckets:
+                        columns, distances = buckets[location]
+                        row[columns] = np.minimum(row[columns], distances + distance)
+                times.frombytes(row.tobytes())
+            return times
+        for source in sources:
+            row = [float('inf') for _ in targets]
+            for location, distance in self._upward_space(source).items():
+                if location in buckets:
+                    columns, distances = buckets[location]
+                    for column, remaining in zip(columns, distances):
+                        if distance + remaining < row[column]:
+                            row[column] = distance + remaining
+            times.extend(row)
+        return times
+
+    def _unpack(self, u: int, v: int) -> List[int]:
+        # Replace each shortcut between u and v with the roads it skips, returning the path without u
+        path = []
+        stack = [(u, v)]
+        while stack:
+            a, b = stack.pop()
+            lower, upper = (a, b) if self.rank[a] < self.rank[b] else (b, a)
+            middle = -1
+            for i in range(self.offsets[lower], self.offsets[lower+1]):
+                if self.targets[i] == upper:
+                    middle = self.middles[i]
+                    break
+            if middle == -1:
+                path.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return path
+
+    def distance(self, start: int, destination: int) -> float:
+        return self._upward_search(start, destination)[0]
+
+    def shortest_path(self, start: int, destination: int) -> Tuple[float, List[int]]:
+        """
+        Function Description: This function finds the shortest time and path from the start to the destination
+
+        Approach Description: The upward searches from the start and the destination meet at the most important location on the shortest path. The locations on each side of the meeting location are followed back to the start and the destination and each road or shortcut between them is unpacked into the roads it skips.
+
+        Time Complexity: O(S·log(S) + P), where S is the size of the two upward search spaces and P is the length of the unpacked path
+        """
+        best, meeting, previous = self._upward_search(start, destination)
+        if meeting is None:
+            # As with a Dijkstra search, the path to a location which cannot be reached is just the location
+            return best, [destination]
+
+        # Follow the upward search from the meeting location back to the start and to the destination
+        up_from_start = []
+        location = meeting
+        while location is not None:
+            up_from_start.append(location)
+            location = previous[0][location]
+        up_from_start.reverse()
+        down_to_destination = []
+        location = previous[1][meeting]
+        while location is not None:
+            down_to_destination.append(location)
+            location = previous[1][location]
+
+        # Unpack each road or shortcut along the path
+        chain = up_from_start + down_to_destination
+        path = [start]
+        for u, v in zip(chain, chain[1:]):
+            path.extend(self._unpack(u, v))
+        return best, path
+
+
+class IndexedMinHeap:
+    """
+    A min heap of locations keyed by distance with true decrease key, holding at most one entry per location in parallel arrays of locations and positions
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.length = 0
+        self.heap = array('q', bytes(8*(max_size + 1)))
+        self.position = array('q', bytes(8*max_size))
+        self.keys = [None for _ in range(max_size)]
+
+    def __len__(self) -> int:
+        return self.length
+
+    def rise(self, k: int) -> None:
+        location = self.heap[k]
+        key = self.keys[location]
+        while k > 1 and key < self.keys[self.heap[k // 2]]:
+            self.heap[k] = self.heap[k // 2]
+            self.position[self.heap[k]] = k
+            k = k // 2
+        self.heap[k] = location
+        self.position[location] = k
+
+    def sink(self, k: int) -> None:
+        location = self.heap[k]
+        key = self.keys[location]
+        while 2 * k <= self.length:
+            child = 2 * k
+            if child < self.length and self.keys[self.heap[child + 1]] < self.keys[self.heap[child]]:
+                child += 1
+            if self.keys[self.heap[child]] >= key:
+                break
+            self.heap[k] = self.heap[child]
+            self.position[self.heap[k]] = k
+            k = child
+        self.heap[k] = location
+        self.position[location] = k
+
+    def push(self, distance, location: int) -> None:
+        # Insert the location, or decrease its key if it is already in the heap
+        self.keys[location] = distance
+        if self.position[location] == 0:
+            self.length += 1
+            self.heap[self.length] = location
+            self.rise(self.length)
+        else:
+            self.rise(self.position[location])
+
+    def clear(self) -> None:
+        # Only the locations still in the heap have a position to forget, so clearing costs as much as the entries left
+        for k in range(1, self.length + 1):
+            self.position[self.heap[k]] = 0
+        self.length = 0
+
+    def pop(self):
+        if self.length == 0:
+            raise IndexError('Heap is empty')
+
+        location = self.heap[1]
+        self.position[location] = 0
+        self.length -= 1
+        if self.length > 0:
+            self.heap[1] = self.heap[self.length + 1]
+            self.sink(1)
+        return self.keys[location], location
+
+
+class BucketQueue:
+    """
+    Dial's bucket queue for integer distances, a circular array of one bucket per distance in the window from the smallest distance to the smallest distance plus the largest road time
+    """
+
+    def __init__(self, max_weight: int) -> None:
+        self.buckets = [[] for _ in range(max_weight + 1)]
+        self.cursor = 0
+        self.length = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def push(self, distance: int, location: int) -> None:
+        # Earlier entries of an improved location are left in their bucket and skipped by the dijkstra function when popped
+        self.buckets[distance % len(self.buckets)].append(location)
+        self.length += 1
+
+    def clear(self) -> None:
+        if self.length:
+            for bucket in self.buckets:
+                bucket.clear()
+        self.cursor = 0
+        self.length = 0
+
+    def pop(self) -> Tuple[int, int]:
+        if self.length == 0:
+            raise IndexError('Queue is empty')
+
+        # Every entry lies within one window of the cursor, so the first non empty bucket holds the smallest distance
+        bucket = self.buckets[self.cursor % len(self.buckets)]
+        while not bucket:
+            self.cursor += 1
+            bucket = self.buckets[self.cursor % len(self.buckets)]
+        self.length -= 1
+        return self.cursor, bucket.pop()
+
+
+class ParallelPlanner:
+    """
+    A process pool that plans batches of queries in parallel over a road graph and pickup table published once in shared memory
+    """
+
+    def __init__(self, city_map: CityMap, processes: Optional[int] = None, chunk_size: Optional[int] = None, cache_size: int = 0) -> None:
+        """
+        Function Description: This initialisation publishes the compact arrays of the city in a shared memory block and starts the worker processes
+
+        Approach Description: The road and pickup arrays are copied one after another into a single shared memory block. Each worker attaches to the block once when it starts and casts its slices back into typed views, creating a CityMap over them with from_arrays, so the graph is never pickled per task and every worker reads the same physical pages.
+
+        Input:
+            city_map: the CityMap to plan on
+            processes: an optional integer representing the amount of worker processes, defaulting to the amount of cores
+            chunk_size: an optional integer representing the amount of queries sent to a worker at a time, defaulting to a quarter of each worker's share of a batch
+            cache_size: an integer representing the amount of shortest path trees each worker keeps in its search cache between chunks
+
+        Time Complexity: O(|R| + |L|), where |R| is the number of roads and |L| is the number of locations, to copy the arrays into shared memory
+
+        Auxiliary Space Complexity: O(|R| + |L|), shared by every worker
+        """
+        roads, pickups = city_map.compact_arrays()
+        buffers = [roads.offsets, roads.targets, roads.weights, pickups.offsets, pickups.friend_ids, pickups.depths]
+
+        # Copy each array into the shared memory block, recording where it starts, how long it is and its type
+        self.layout = []
+        size = 0
+        for buffer in buffers:
+            view = memoryview(buffer)
+            self.layout.append((size, view.nbytes, view.format))
+            size += view.nbytes
+        self.memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for buffer, (offset, _, _) in zip(buffers, self.layout):
+            data = memoryview(buffer).cast('B')
+            self.memory.buf[offset:offset+data.nbytes] = data
+
+        self.locations = city_map.locations
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool = multiprocessing.Pool(self.processes, _attach_worker, (self.memory.name, self.layout, pickups.friend_names, cache_size))
+
+    def plan_many(self, queries: Iterable[Tuple[int, int]]) -> List[Tuple[int, List[int], str, int]]:
+        """
+        Function Description: This function plans a batch of (start, destination) queries across the worker processes and returns the plans in the order of the queries
+
+        Approach Description: The queries are sorted so queries sharing endpoints land in the same chunk, where the worker's plan_many searches from each of them only once. The chunks are planned in parallel and the plans are put back in the order of the queries.
+
+        Time Complexity: O(|Q|log(|Q|)) in this process plus the planning of each chunk divided across the workers, where |Q| is the number of queries
+        """
+        queries = list(queries)
+        order = sorted(range(len(queries)), key=lambda index: queries[index])
+        chunk_size = self.chunk_size or max(1, -(-len(queries) // (4*self.processes)))
+        chunks = [[queries[index] for index in order[i:i+chunk_size]] for i in range(0, len(order), chunk_size)]
+
+        plans = [None for _ in range(len(queries))]
+        position = 0
+        for chunk_plans in self.pool.imap(_plan_chunk, chunks):
+            for plan in chunk_plans:
+                plans[order[position]] = plan
+                position += 1
+        return plans
+
+    def close(self) -> None:
+        self.pool.close()
+        self.pool.join()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self) -> 'ParallelPlanner':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# The CityMap attached to the shared memory block in each worker process
+_worker_memory = None
+_worker_city = None
+
+
+def _attach_worker(name: str, layout: List[Tuple[int, int, str]], friend_names: List[str], cache_size: int) -> None:
+    global _worker_memory, _worker_city
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    views = [_worker_memory.buf[offset:offset+nbytes].cast(typecode) for offset, nbytes, typecode in layout]
+    _worker_city = CityMap.from_arrays(CSRGraph(*views[:3]), PickupTable(*views[3:], friend_names), cache_size)
+
+
+def _plan_chunk(chunk: List[Tuple[int, int]]) -> List[Tuple[int, List[int], str, int]]:
+    return _worker_city.plan_many(chunk)
+
+
+class PlanningService:
+    """
+    An asyncio front end which batches plans arriving close together and runs each batch once in an executor
+    """
+
+    def __init__(self, planner, window: float = 0.001, executor=None) -> None:
+        """
+        Function Description: This initialisation wraps a CityMap or ParallelPlanner so that it can be planned on from coroutines and over a local connection
+
+        Approach Description: Plans are not run as they arrive. Each waits with a future in a table keyed by its query, and a single batching task sleeps for the window before taking every waiting query as a batch. The batch is handed to plan_many in the executor, which searches from each start and destination shared within it only once, and each plan is then given to every future waiting on that query. Batches run one at a time, so a CityMap is never used by two threads at once, and queries arriving while a batch runs form the next one.
+
+        Input:
+            planner: a CityMap or ParallelPlanner to plan with
+            window: a float representing the seconds to wait for more queries before planning a batch
+            executor: an optional concurrent.futures executor to plan in, defaulting to the event loop's default executor
+        """
+        self.planner = planner
+        self.window = window
+        self.executor = executor
+        self.waiting = {}
+        self.batches = 0
+        self.batcher = None
+
+    async def plan(self, start: int, destination: int) -> Tuple[int, List[int], str, int]:
+        """
+        Function Description: This function plans a route from a coroutine, returning the same plan as CityMap.plan
+
+        Approach Description: A future for the query is added to the table of waiting queries and the batching task is started if it is not already running, then the future is awaited
+
+        Input:
+            start: an integer representing the starting location
+            destination: an integer representing the destination location
+
+        Output: The same tuple as CityMap.plan
+        """
+        for location in (start, destination):
+            if not isinstance(location, int) or not 0 <= location <= self.planner.locations:
+                raise ValueError(f'{location!r} is not a location')
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiting.setdefault((start, destination), []).append(future)
+        if self.batcher is None or self.batcher.done():
+            self.batcher = loop.create_task(self._run_batches())
+        return await future
+
+    async def _run_batches(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.waiting:
+            await asyncio.sleep(self.window)
+            batch, self.waiting = self.waiting, {}
+            queries = list(batch)
+            try:
+                plans = await loop.run_in_executor(self.executor, self.planner.plan_many, queries)
+            except Exception as error:
+                for futures in batch.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(error)
+                continue
+            self.batches += 1
+
+            # Give each waiter its own copy of the path so one cannot change another's plan
+            for query, (time, path, friend, location) in zip(queries, plans):
+                for future in batch[query]:
+                    if not future.done():
+                        future.set_result((time, None if path is None else list(path), friend, location))
+
+    async def start_server(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.AbstractServer:
+        """
+        Function Description: This function starts a server answering plans over a line protocol, returning the asyncio server
+
+        Approach Description: Each line sent to the server is a JSON object with a start and a destination, and an optional id which is sent back. Each reply is a JSON object on its own line with the time, path, friend and location of the plan, or an error. The lines of a connection are planned concurrently, so they share batches, but replied to in the order they were sent.
+
+        Input:
+            host: a string representing the address to listen on, only the local machine by default
+            port: an integer representing the port to listen on, 0 for any free port which can then be read from the server's sockets
+
+        Output: The asyncio server, which is closed with its close and wait_closed functions
+        """
+        return await asyncio.start_server(self._serve_connection, host, port)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        replies = asyncio.Queue()
+
+        async def write_replies():
+            while (reply := await replies.get()) is not None:
+                writer.write(json.dumps(await reply).encode() + b'\n')
+                await writer.drain()
+
+        writing = asyncio.create_task(write_replies())
+        try:
+            async for line in reader:
+                if line.strip():
+                    replies.put_nowait(asyncio.ensure_future(self._reply(line)))
+        finally:
+            replies.put_nowait(None)
+            await writing
+            writer.close()
+            await writer.wait_closed()
+
+    async def _reply(self, line: bytes) -> dict:
+        reply = {}
+        try:
+            request = json.loads(line)
+            if 'id' in request:
+                reply['id'] = request['id']
+            time, path, friend, location = await self.plan(request['start'], request['destination'])
+        except KeyError as error:
+            reply['error'] = f'missing {error}'
+            return reply
+        except Exception as error:
+            # Any other failure, such as a closed process pool, is sent back rather than ending the connection's replies
+            reply['error'] = str(error) or type(error).__name__
+            return reply
+        reply.update(time=None if time == float('inf') else time, path=path, friend=friend, location=location)
+        return reply
+
+
+def _number(value: str):
+    # Parse a road or track time as an integer if it is one, otherwise as a float
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
 """
 Adapted from the 1008/2085 MaxHeap implementation
 MaxHeap authored by: Brendon Taylor, modified by Massimo Nodin
@@ -277,9 +2455,21 @@ class MinHeap:
 
     def add(self, element) -> bool:
         self.length += 1
+        if self.length == len(self.array):
+            self.array.extend([None for _ in range(self.length)])
         self.array[self.length] = element
         self.rise(self.length)
 
+    def push(self, distance, location: int) -> None:
+        self.add((distance, location))
+
+    def clear(self) -> None:
+        # The entries past the length are never read, so the array is kept for the next search
+        self.length = 0
+
+    def pop(self):
+        return self.get_min()
+
     def smallest_child(self, k: int) -> int:
         if 2 * k == self.length:
             return 2 * k
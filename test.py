@@ -1,5 +1,22 @@
+import asyncio
+import concurrent.futures
+import copy
+import json
+import os
+import pickle
+import tempfile
 import unittest
-from roads_and_tracks import CityMap
+import unittest.mock
+import weakref
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from benchmarks.generators import GENERATORS
+import roads_and_tracks
+from roads_and_tracks import CityMap, IndexedMinHeap, ParallelPlanner, PickupIndex, PlanningService, PlanStats, SearchStats
 
 class TestCityMap(unittest.TestCase):
     
@@ -205,6 +222,400 @@ class TestCityMap(unittest.TestCase):
         expected = (0, [4], 'Winter', 4)
         error_message = f'Current wrong path: {path}'
         self.assertEqual(path, expected, error_message)
+
+    def test_dijkstra_shortest_path_tree(self):
+        tree = self.myCity1.dijkstra(2)
+        self.assertEqual(tree.source, 2)
+        self.assertEqual(tree.distances, [3, 7, 0, 5, 2, 5])
+        self.assertEqual(tree.path_to(1), [2, 0, 1])
+        self.assertEqual(tree.path_from(1), [1, 0, 2])
+
+    def test_plan_runs_two_searches(self):
+        calls = []
+        dijkstra = self.myCity1.dijkstra
+        self.myCity1.dijkstra = lambda *args: calls.append(args) or dijkstra(*args)
+        result = self.myCity1.plan(start=2, destination=5)
+        self.assertEqual(result, (5, [2,4,5], "Ice", 4))
+        self.assertEqual(len(calls), 2)
+
+    def test_compact_graph_matches_adjacency_list(self):
+        for roads, tracks, friends in [(self.roads1, self.tracks1, self.friends1), (self.roads2, self.tracks2, self.friends2), (self.roads3, self.tracks3, self.friends3)]:
+            myCity = CityMap(roads, tracks, friends)
+            compactCity = CityMap(roads, tracks, friends, compact=True)
+            self.assertEqual(len(compactCity.roads.targets), 2*len(roads))
+            for location in range(myCity.locations+1):
+                self.assertEqual(list(compactCity.roads[location]), myCity.roads[location])
+                self.assertEqual(compactCity.pickups[location], myCity.pickups[location])
+            for start in range(myCity.locations+1):
+                for destination in range(myCity.locations+1):
+                    self.assertEqual(compactCity.plan(start, destination), myCity.plan(start, destination))
+
+    def test_plan_many_matches_plan(self):
+        queries = [(2, 5), (0, 4), (2, 0), (2, 5), (5, 2), (4, 4)]
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, cache_size=4)
+        calls = []
+        dijkstra = myCity.dijkstra
+        myCity.dijkstra = lambda *args: calls.append(args) or dijkstra(*args)
+        self.assertEqual(myCity.plan_many(queries), [self.myCity1.plan(s, d) for s, d in queries])
+        self.assertEqual(sorted(source for source, in calls), [0, 2, 4, 5])
+
+    def test_plan_many_holds_at_most_cache_size_trees(self):
+        queries = [(start, destination) for start in range(6) for destination in range(6)]
+        for cache_size in (0, 1, 3):
+            myCity = CityMap(self.roads1, self.tracks1, self.friends1, cache_size=cache_size)
+            searched = []
+            alive = []
+            dijkstra = myCity.dijkstra
+            def counting_dijkstra(*args):
+                alive.append(sum(tree() is not None for tree in searched))
+                tree = dijkstra(*args)
+                searched.append(weakref.ref(tree))
+                return tree
+            myCity.dijkstra = counting_dijkstra
+            self.assertEqual(myCity.plan_many(queries), [self.myCity1.plan(s, d) for s, d in queries])
+            self.assertLess(max(alive), max(cache_size, 2) + cache_size)
+
+    def test_search_cache_shared_with_plan(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, cache_size=2)
+        self.assertEqual(myCity.plan(start=2, destination=5), (5, [2,4,5], "Ice", 4))
+        self.assertEqual(myCity.search_cache.info(), (0, 2, 2, 2))
+        self.assertEqual(myCity.plan(start=5, destination=2), (5, [5,4,2], "Ice", 4))
+        self.assertEqual(myCity.search_cache.info(), (2, 2, 2, 2))
+        myCity.plan(start=0, destination=2)
+        self.assertEqual(myCity.search_cache.info(), (3, 3, 2, 2))
+        self.assertEqual(list(myCity.search_cache.trees), [0, 2])
+
+    def test_parallel_planner_matches_plan(self):
+        queries = [(start, destination) for start in range(6) for destination in range(6)]
+        with ParallelPlanner(self.myCity2, processes=2, chunk_size=5) as planner:
+            self.assertEqual(planner.plan_many(queries), [self.myCity2.plan(start, destination) for start, destination in queries])
+
+    def test_contraction_hierarchy_matches_dijkstra(self):
+        myCity = CityMap(self.roads3, self.tracks3, self.friends3)
+        hierarchy = pickle.loads(pickle.dumps(myCity.build_contraction_hierarchy()))
+        for start in range(myCity.locations+1):
+            tree = myCity.dijkstra(start)
+            for destination in range(myCity.locations+1):
+                time, path = hierarchy.shortest_path(start, destination)
+                self.assertEqual(time, tree.distance(destination))
+                self.assertEqual((path[0], path[-1]), (start, destination))
+        self.assertEqual(myCity.reconstruct_path(0, 4, 5), [0, 2, 4, 2, 5])
+        self.assertEqual(myCity.plan(start=2, destination=5), (6, [2,4,2,5], "Grizz", 4))
+        myCity = CityMap([(0,1,1), (2,3,1)], [], [("Ice", 2)])
+        expected = (myCity.shortest_path(0, 2), myCity.reconstruct_path(0, 2, 1))
+        myCity.build_contraction_hierarchy()
+        self.assertEqual((myCity.shortest_path(0, 2), myCity.reconstruct_path(0, 2, 1)), expected)
+        self.assertEqual(expected[0], (float('inf'), [2]))
+
+    def test_contraction_hierarchy_upward_search_spaces_are_small(self):
+        myCity = CityMap(*GENERATORS['grid'](2500, 1))
+        hierarchy = myCity.build_contraction_hierarchy()
+        locations = myCity.locations+1
+        spaces = [len(hierarchy._upward_space(source)) for source in range(0, locations, 25)]
+        self.assertLess(sum(spaces) / len(spaces), 0.02 * locations)
+        for start in range(0, locations, 250):
+            tree = myCity.dijkstra(start)
+            for destination in range(7, locations, 311):
+                time, path = hierarchy.shortest_path(start, destination)
+                self.assertEqual(time, tree.distance(destination))
+                self.assertEqual(sum(dict(myCity.roads[u])[v] for u, v in zip(path, path[1:])), time)
+
+    def test_landmark_search_matches_dijkstra(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, landmarks=2)
+        self.assertEqual(len(myCity.landmarks.locations), 2)
+        for start in range(myCity.locations+1):
+            tree = myCity.dijkstra(start)
+            for destination in range(myCity.locations+1):
+                time, path = myCity.shortest_path(start, destination)
+                self.assertEqual(time, tree.distance(destination))
+                self.assertEqual((path[0], path[-1]), (start, destination))
+        self.assertEqual(myCity.shortest_path(2, 5), (5, [2, 4, 5]))
+        myCity = CityMap([(0,1,1), (1,2,2), (3,4,1), (4,5,3), (5,6,1)], [], [("Ice", 2)], landmarks=3)
+        for start in range(myCity.locations+1):
+            tree = myCity.dijkstra(start)
+            bound = myCity.landmarks.lower_bound_to(start)
+            for destination in range(myCity.locations+1):
+                self.assertLessEqual(bound(destination), tree.distance(destination))
+                self.assertEqual(myCity.shortest_path(start, destination), (tree.distance(destination), tree.path_to(destination)))
+        self.assertEqual(myCity.reconstruct_path(0, 5, 6), [5, 6])
+
+    def test_priority_queues_match(self):
+        self.assertEqual(self.myCity1.queue, 'bucket')
+        self.assertEqual(CityMap([(0,1,2.5)], [], []).queue, 'indexed')
+        for start in range(self.myCity3.locations+1):
+            expected = self.myCity3.dijkstra(start, queue='heap').distances
+            for queue in ('indexed', 'bucket'):
+                self.assertEqual(self.myCity3.dijkstra(start, queue=queue).distances, expected)
+        heap = IndexedMinHeap(4)
+        for distance, location in [(5, 0), (3, 1), (4, 2), (1, 0), (2, 3)]:
+            heap.push(distance, location)
+        self.assertEqual(len(heap), 4)
+        self.assertEqual([heap.pop() for _ in range(4)], [(1, 0), (2, 3), (3, 1), (4, 2)])
+
+    def test_road_updates_repair_cached_trees(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, cache_size=6)
+        for start in range(6):
+            myCity.shortest_path_tree(start)
+        myCity.update_road_time(2, 4, 10)
+        myCity.add_road(5, 6, 1)
+        myCity.remove_road(0, 3)
+        expected = CityMap(self.roads1[:1] + [(2,0,3), (3,1,2), (2,4,10), (4,5,3), (5,6,1)], self.tracks1, self.friends1)
+        for start, tree in myCity.search_cache.trees.items():
+            self.assertEqual(tree.distances, expected.dijkstra(start).distances)
+        self.assertEqual(myCity.plan(start=2, destination=5), expected.plan(start=2, destination=5))
+        with self.assertRaises(ValueError):
+            myCity.remove_road(0, 3)
+
+    def test_move_friend_and_add_track(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1)
+        myCity.move_friend("Ice", 0)
+        self.assertEqual(myCity.pickups[0], (("Ice", 0),))
+        self.assertEqual(myCity.pickups[4], (("Grizz", 2),))
+        myCity.add_track(1, 4)
+        self.assertEqual(myCity.pickups[4], (("Grizz", 1),))
+        self.assertEqual(myCity.plan(start=2, destination=5), (5, [2,4,5], "Grizz", 4))
+        for compact in (False, True):
+            myCity = CityMap(self.roads1, self.tracks1, self.friends1, compact=compact)
+            myCity.move_friend("Ice", 7)
+            myCity.add_track(7, 5)
+            self.assertEqual(myCity.locations, 7)
+            self.assertEqual(myCity.pickups[5], (("Ice", 1),))
+            self.assertEqual(myCity.plan(start=7, destination=7), (0, [7], "Ice", 7))
+            with self.assertRaises(ValueError):
+                myCity.add_track(-1, 0)
+            with self.assertRaises(ValueError):
+                myCity.move_friend("Grizz", -2)
+            self.assertEqual(myCity.tracks[-1], (7, 5, 0))
+            self.assertEqual(myCity.friends, [("Grizz", 1), ("Ice", 7)])
+            myCity.add_track(1, 0)
+            self.assertEqual(myCity.pickups[0], (("Grizz", 1),))
+
+    def test_pickups_keep_every_friend(self):
+        self.assertEqual(self.myCity1.pickups[4], (("Ice", 1), ("Grizz", 2)))
+        self.assertEqual(self.myCity1.pickups[5], (("Ice", 2),))
+        self.assertEqual(self.myCity1.pickups[0], ())
+        myCity = CityMap(self.roads1, list(reversed(self.tracks1)), self.friends1, compact=True, max_tracks=3)
+        self.assertEqual(myCity.pickups[5], (("Ice", 2), ("Grizz", 3)))
+        self.assertEqual(myCity.pickups[1], (("Grizz", 0), ("Ice", 3)))
+        self.assertEqual(CityMap(self.roads1, self.tracks1, self.friends1, max_tracks=0).pickups[4], ())
+        for compact in (False, True):
+            myCity = CityMap([(0,1,1), (1,2,1)], [(2,0,0)], [("A",1), ("B",1)], compact=compact)
+            self.assertEqual(myCity.pickups[1], (("B", 0), ("A", 0)))
+            self.assertEqual(myCity.pickups[0], ())
+            self.assertEqual(myCity.plan(start=0, destination=2), (2, [0,1,2], "B", 1))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_vectorized_pickup_scan_matches(self):
+        for roads, tracks, friends in [(self.roads1, self.tracks1, self.friends1), (self.roads2, self.tracks2, self.friends2), (self.roads3, self.tracks3, self.friends3), ([(0,1,1), (2,3,1)], [], [("Ice", 2), ("Grizz", 3)]), ([(0,1,1), (2,3,1)], [], [("Ice", 2)]), ([(0,1,1)], [], [])]:
+            myCity = CityMap(roads, tracks, friends)
+            vectorizedCity = CityMap(roads, tracks, friends, vectorized=True)
+            queries = [(start, destination) for start in range(myCity.locations+1) for destination in range(myCity.locations+1)]
+            expected = [myCity.plan(start, destination) for start, destination in queries]
+            self.assertEqual([vectorizedCity.plan(start, destination) for start, destination in queries], expected)
+            self.assertEqual(vectorizedCity.plan_many(queries), expected)
+
+    def test_save_and_load(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, landmarks=2)
+        myCity.build_contraction_hierarchy()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'city.bin')
+            myCity.save(path)
+            for mmap in (True, False):
+                loadedCity = CityMap.load(path, mmap=mmap)
+                self.assertEqual(loadedCity.landmarks.locations, myCity.landmarks.locations)
+                for start in range(6):
+                    for destination in range(6):
+                        self.assertEqual(loadedCity.plan(start, destination), myCity.plan(start, destination))
+                        self.assertEqual(loadedCity.shortest_path(start, destination), myCity.shortest_path(start, destination))
+                loadedCity.add_road(5, 6, 1)
+                loadedCity.move_friend("Ice", 6)
+                self.assertEqual(loadedCity.plan(start=6, destination=6), (0, [6], "Ice", 6))
+            with open(path, 'r+b') as file:
+                file.write(b'NOTACITY')
+            with self.assertRaises(ValueError):
+                CityMap.load(path)
+
+    def test_from_iterables_and_csv(self):
+        myCity = CityMap.from_iterables((road for road in self.roads1), iter(self.tracks1), iter(self.friends1), compact=True)
+        self.assertEqual(myCity.plan(start=2, destination=5), (5, [2,4,5], "Ice", 4))
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, rows in [('roads', ['u,v,time'] + [f'{u},{v},{m}' for u, v, m in self.roads3]), ('tracks', [f'{u},{v},{m}' for u, v, m in self.tracks3]), ('friends', ['name,location', 'Grizz,1'])]:
+                paths.append(os.path.join(directory, f'{name}.csv'))
+                with open(paths[-1], 'w') as file:
+                    file.write('\n'.join(rows) + '\n\n')
+            myCity = CityMap.from_csv(*paths)
+            self.assertEqual(myCity.plan(start=2, destination=5), (6, [2,4,2,5], "Grizz", 4))
+
+    def test_benchmark_generators_are_seeded_and_connected(self):
+        for name, generator in GENERATORS.items():
+            self.assertEqual(generator(300, seed=1), generator(300, seed=1))
+            myCity = CityMap(*generator(300, seed=1))
+            self.assertTrue(all(distance < float('inf') for distance in myCity.dijkstra(0).distances), name)
+
+    def test_search_and_plan_stats(self):
+        for compact in (False, True):
+            myCity = CityMap(self.roads1, self.tracks1, self.friends1, compact=compact, cache_size=2)
+            stats = SearchStats()
+            self.assertEqual(myCity.dijkstra(0, stats=stats).distances, myCity.dijkstra(0).distances)
+            self.assertEqual((stats.settled, stats.relaxed), (6, 2 * len(self.roads1)))
+            stats = SearchStats()
+            myCity.dijkstra(0, destination=1, stats=stats)
+            self.assertLess(stats.settled, 6)
+            stats = PlanStats()
+            self.assertEqual(myCity.plan(start=2, destination=5, stats=stats), (5, [2,4,5], "Ice", 4))
+            self.assertEqual(set(stats.timings), {'start_search', 'destination_search', 'pickup_scan', 'reconstruct_path'})
+            self.assertFalse(stats.start_search.cached)
+            sampled = []
+            myCity.set_stats_hook(sampled.append)
+            self.assertEqual(myCity.plan(start=2, destination=5), (5, [2,4,5], "Ice", 4))
+            self.assertTrue(sampled[0].start_search.cached and sampled[0].destination_search.cached)
+            myCity.set_stats_hook(sampled.append, sample_rate=0)
+            myCity.plan(start=2, destination=5)
+            self.assertEqual(len(sampled), 1)
+
+    def test_planning_service_coalesces_searches(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1)
+        searches = []
+        dijkstra = myCity.dijkstra
+        myCity.dijkstra = lambda source: searches.append(source) or dijkstra(source)
+        queries = [(2, 5), (2, 5), (2, 0), (5, 0), (2, 5)]
+
+        async def run():
+            service = PlanningService(myCity, window=0.01)
+            plans = await asyncio.gather(*(service.plan(start, destination) for start, destination in queries))
+            with self.assertRaises(ValueError):
+                await service.plan(2, 99)
+            server = await service.start_server()
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b'{"id": 1, "start": 2, "destination": 5}\n{"start": 2}\n{"start": 0, "destination": 3}\n')
+            writer.write_eof()
+            replies = [json.loads(line) for line in (await reader.read()).splitlines()]
+            writer.close()
+            await writer.wait_closed()
+            server.close()
+            await server.wait_closed()
+
+            # A planner failing, such as a closed process pool, is replied to without ending the connection
+            class FailingOnce:
+                locations = myCity.locations
+                failed = False
+
+                def plan_many(self, queries):
+                    if not self.failed:
+                        self.failed = True
+                        raise RuntimeError('pool closed')
+                    return myCity.plan_many(queries)
+
+            server = await PlanningService(FailingOnce()).start_server()
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b'{"start": 2, "destination": 5}\n')
+            replies.append(json.loads(await reader.readline()))
+            writer.write(b'{"start": 2, "destination": 5}\n')
+            writer.write_eof()
+            replies.extend(json.loads(line) for line in (await reader.read()).splitlines())
+            writer.close()
+            await writer.wait_closed()
+            server.close()
+            await server.wait_closed()
+            return service, plans, replies
+
+        service, plans, replies = asyncio.run(run())
+        self.assertEqual(plans, [CityMap(self.roads1, self.tracks1, self.friends1).plan(start, destination) for start, destination in queries])
+        self.assertEqual(sorted(searches[:3]), [0, 2, 5])
+        self.assertEqual(replies[0], {'id': 1, 'time': 5, 'path': [2,4,5], 'friend': 'Ice', 'location': 4})
+        self.assertIn('error', replies[1])
+        self.assertEqual(replies[2]['time'], self.myCity1.plan(0, 3)[0])
+        self.assertLessEqual(service.batches, 3)
+        self.assertEqual(replies[3:], [{'error': 'pool closed'}, {'time': 5, 'path': [2,4,5], 'friend': 'Ice', 'location': 4}])
+
+    def test_bounded_plan_matches_plan(self):
+        for roads, tracks, friends in [(self.roads1, self.tracks1, self.friends1), (self.roads2, self.tracks2, self.friends2), (self.roads3, self.tracks3, self.friends3), GENERATORS['geometric'](200, seed=2), ([(0,1,1), (2,3,1)], [], [("Ice", 2), ("Grizz", 3)])]:
+            for compact in (False, True):
+                myCity = CityMap(roads, tracks, friends, compact=compact)
+                step = 13 if myCity.locations > 50 else 1
+                for start in range(0, myCity.locations+1, step):
+                    for destination in range(step // 2, myCity.locations+1, step):
+                        self.assertEqual(myCity.plan(start, destination, bounded=True), myCity.plan(start, destination))
+        stats = PlanStats()
+        myCity = CityMap(*GENERATORS['grid'](900, seed=1))
+        self.assertEqual(myCity.plan(0, 1, stats=stats, bounded=True), myCity.plan(0, 1))
+        self.assertLess(stats.start_search.settled + stats.destination_search.settled, myCity.locations)
+
+    def test_distance_matrix(self):
+        myCity = CityMap(*GENERATORS['geometric'](200, seed=4))
+        sources, targets = [0, 7, 7, 150], [3, 0, 199, 42, 7]
+        expected = [[myCity.dijkstra(source).distances[target] for target in targets] for source in sources]
+        expected_pickups = [[myCity.plan(source, target)[0] for target in targets] for source in sources]
+        for hierarchy in (False, True):
+            if hierarchy:
+                myCity.build_contraction_hierarchy()
+            for numpy_module in ({numpy, None} if numpy is not None else {None}):
+                with unittest.mock.patch.object(roads_and_tracks, 'np', numpy_module):
+                    matrix = myCity.distance_matrix(sources, targets, pickups=True)
+                    self.assertEqual(matrix.shape, (4, 5))
+                    self.assertEqual(matrix.tolist(), expected)
+                    self.assertEqual(matrix.tolist(pickups=True), expected_pickups)
+                    self.assertEqual(matrix[1, 2], expected[1][2])
+        with self.assertRaises(ValueError):
+            myCity.distance_matrix(sources, targets).pickup_time(0, 0)
+        for row, column in [(0, 5), (4, 0), (-1, 0), (0, -1)]:
+            with self.assertRaises(IndexError):
+                matrix[row, column]
+            with self.assertRaises(IndexError):
+                matrix.pickup_time(row, column)
+
+    def test_search_workspaces_are_reused_per_thread(self):
+        myCity = CityMap(*GENERATORS['grid'](400, seed=3))
+        queries = [(start, (start * 37) % 400) for start in range(0, 400, 9)]
+        expected = [(myCity.plan(start, destination), myCity.dijkstra(start).distance(destination)) for start, destination in queries]
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda query: (myCity.plan(*query, bounded=True), myCity.shortest_path(*query)[0]), queries))
+        self.assertEqual(results, expected)
+        self.assertIs(myCity._workspaces(1)[0], myCity._workspaces(2)[0])
+        with unittest.mock.patch.object(myCity, '_priority_queue', side_effect=AssertionError('a priority queue was made for a search')):
+            self.assertEqual([(myCity.plan(start, destination), myCity.dijkstra(start).distance(destination)) for start, destination in queries[:5]], expected[:5])
+        for copied in (pickle.loads(pickle.dumps(myCity)), copy.deepcopy(myCity)):
+            self.assertEqual([copied.plan(*query, bounded=True) for query in queries], [result for result, _ in expected])
+        myCity.add_road(399, 400, 1)
+        self.assertEqual(myCity.shortest_path(0, 400)[0], myCity.dijkstra(0).distance(400))
+        self.assertEqual(myCity.plan(400, 0, bounded=True), myCity.plan(400, 0))
+
+    def test_pickup_index(self):
+        for compact in (False, True):
+            myCity = CityMap(self.roads3, self.tracks3, self.friends3, compact=compact, pickup_index=True)
+            plainCity = CityMap(self.roads3, self.tracks3, self.friends3, compact=compact)
+            for moves in [[], [("move_friend", "Grizz", 0)], [("add_track", 5, 2)], [("move_friend", "Grizz", 5)]]:
+                for method, *args in moves:
+                    getattr(myCity, method)(*args)
+                    getattr(plainCity, method)(*args)
+                fresh = PickupIndex(myCity.roads, myCity._pickup_depths())
+                self.assertEqual(myCity.pickup_index.nearest, fresh.nearest)
+                self.assertEqual(myCity.pickup_index.distances, fresh.distances)
+                for start in range(myCity.locations+1):
+                    expected = plainCity.plan(start, start)
+                    self.assertEqual(myCity.plan(start, start), expected)
+                    self.assertEqual(myCity.closest_friend(start), (expected[0] / 2, expected[2], expected[3]))
+                    for destination in range(myCity.locations+1):
+                        self.assertEqual(myCity.plan(start, destination, bounded=True), plainCity.plan(start, destination))
+            myCity.add_road(0, 5, 1)
+            self.assertIsNone(myCity.pickup_index)
+        self.assertEqual(CityMap([(0,1,1), (2,3,1)], [], [("Ice", 2)]).closest_friend(0), (float('inf'), None, None))
+
+    def test_plan_top_k(self):
+        myCity = CityMap(self.roads1, self.tracks1, self.friends1, compact=True)
+        for start in range(myCity.locations+1):
+            for destination in range(myCity.locations+1):
+                options = myCity.plan_top_k(start, destination, 3)
+                self.assertEqual(options[0].as_plan(), myCity.plan(start, destination))
+                self.assertEqual([(option.time, option.depth) for option in options], sorted((option.time, option.depth) for option in options))
+                self.assertEqual(len({(option.friend, option.location) for option in options}), len(options))
+        options = myCity.plan_top_k(2, 5, 10)
+        self.assertEqual([(option.time, option.friend, option.location) for option in options[:2]], [(5, "Ice", 4), (5, "Grizz", 4)])
+        self.assertEqual(options[1].path, [2,4,5])
+        myCity = CityMap([(0,1,1), (2,3,1)], [], [("Ice", 2)])
+        self.assertEqual(myCity.plan_top_k(0, 1, 2), [])
+        self.assertEqual(myCity.plan(0, 1), (float('inf'), [2], "Ice", 2))
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file